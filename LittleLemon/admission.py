@@ -0,0 +1,121 @@
+"""
+Admission control for the LittleLemon project.
+
+Each worker process admits at most ADMISSION_MAX_CONCURRENCY requests at once,
+further requests wait for a slot, higher priority classes first. The time
+requests spend waiting is tracked as a moving average; once it exceeds
+ADMISSION_LATENCY_TARGET_MS the lowest priority class is turned away with a
+503 instead of queueing (at twice the target the next class, and so on), so
+checkouts keep flowing while menu browsing is shed. The highest priority
+class is never shed, it only gives up after ADMISSION_MAX_WAIT_MS.
+
+The limit applies to threaded workers (gunicorn gthread, uWSGI threads), a
+sync worker only ever handles one request.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+# Weight of the latest queue delay in the moving average
+SMOOTHING = 0.2
+
+
+def classify(method, path):
+    """ The priority class of a request, from the first matching ADMISSION_RULES entry """
+    for name, methods, prefix in settings.ADMISSION_RULES:
+        if path.startswith(prefix) and (methods is None or method in methods):
+            return name
+    return settings.ADMISSION_DEFAULT_CLASS
+
+
+class AdmissionController:
+    def __init__(self, limit, classes, latency_target, max_wait):
+        self.limit = limit
+        self.classes = list(classes)
+        self.latency_target = latency_target
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = Counter()
+        self.queue_delay = 0.0
+        self.counters = {name: Counter() for name in self.classes}
+
+    def sheds(self, priority):
+        """ Whether requests of this priority are turned away instead of queued """
+        if priority == 0:
+            return False
+        return self.queue_delay > self.latency_target * (len(self.classes) - priority)
+
+    def must_wait(self, priority):
+        return self.active >= self.limit or any(self.waiting[p] for p in range(priority))
+
+    def admit(self, name):
+        """ Take a slot for a request of the given class, False when it is shed """
+        priority = self.classes.index(name)
+        counters = self.counters[name]
+        started = time.monotonic()
+        with self.condition:
+            if self.must_wait(priority) and self.sheds(priority):
+                counters['shed'] += 1
+                return False
+            deadline = started + self.max_wait
+            while self.must_wait(priority):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    counters['timed_out'] += 1
+                    return False
+                self.waiting[priority] += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting[priority] -= 1
+            self.active += 1
+            self.queue_delay += SMOOTHING * (time.monotonic() - started - self.queue_delay)
+            counters['admitted'] += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'queue_delay_ms': round(self.queue_delay * 1000, 1),
+                'latency_target_ms': round(self.latency_target * 1000, 1),
+                'classes': {
+                    name: {
+                        'priority': priority,
+                        'waiting': self.waiting[priority],
+                        'shedding': self.sheds(priority),
+                        'admitted': self.counters[name]['admitted'],
+                        'shed': self.counters[name]['shed'],
+                        'timed_out': self.counters[name]['timed_out'],
+                    }
+                    for priority, name in enumerate(self.classes)
+                },
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def controller():
+    """ The admission controller of this worker process, created from the settings on first use """
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    settings.ADMISSION_MAX_CONCURRENCY,
+                    settings.ADMISSION_CLASSES,
+                    settings.ADMISSION_LATENCY_TARGET_MS / 1000,
+                    settings.ADMISSION_MAX_WAIT_MS / 1000,
+                )
+    return _controller
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .admission import classify, controller
+from .routers import start_request, end_request, current_state, resolved_user, pin_key, SAFE_METHODS
+from .sharding import ALL, set_location, reset_location
+
+
+class AdmissionControlMiddleware:
+    """
+    Limit the requests a worker handles at once and shed low priority
+    requests with 503 + Retry-After when they would queue for longer than
+    the latency target, see LittleLemon/admission.py.
+    Comes first so that shed requests cost as little as possible.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        admission = controller()
+        if not admission.admit(classify(request.method, request.path_info)):
+            response = JsonResponse({'error': 'The server is busy, please retry shortly'}, status=503)
+            response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER_SECONDS)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            admission.release()
+
+
+class ReplicaPinningMiddleware:
+    """
+    Track each request for PrimaryReplicaRouter.
+    After a request that wrote to the primary, the user's reads are pinned
+    to the primary for REPLICA_PIN_SECONDS so replication lag never hides
+    their own changes.
+    Must come before any middleware that queries the database.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_request(request)
+        try:
+            response = self.get_response(request)
+            state = current_state()
+            user = resolved_user(request)
+            if state.pinned and user is not None and settings.DATABASE_REPLICAS:
+                cache.set(pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+            return response
+        finally:
+            end_request(token)
+
+
+class LocationMiddleware:
+    """
+    Set the restaurant location of the request from the X-Location header
+    or ?location=, DEFAULT_LOCATION otherwise, see LittleLemon/sharding.py.
+    ?location=all is only accepted for reads.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        location = request.headers.get('X-Location') or request.GET.get('location') or settings.DEFAULT_LOCATION
+        if location not in settings.ORDER_SHARDS and not (location == ALL and request.method in SAFE_METHODS):
+            return JsonResponse({'error': f'Unknown location {location!r}'}, status=400)
+        token = set_location(location)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_location(token)
+
+
+def is_stateless(request):
+    """ An API request authenticated with a JWT in the Authorization header """
+    if not request.path_info.startswith(tuple(settings.STATELESS_PATH_PREFIXES)):
+        return False
+    header = request.META.get(jwt_settings.AUTH_HEADER_NAME, '').split(' ', 1)[0]
+    return header in jwt_settings.AUTH_HEADER_TYPES
+
+
+class BrowserOnlyMixin:
+    """
+    Skip a session, CSRF, authentication or messages middleware for JWT
+    requests to STATELESS_PATH_PREFIXES. DRF authenticates them from the
+    token, so they need no session lookup, CSRF check or message storage.
+    Browser requests (admin, browsable API) run the middleware as before.
+    """
+    def __call__(self, request):
+        if is_stateless(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_stateless(request) or not hasattr(super(), 'process_view'):
+            return None
+        return super().process_view(request, view_func, view_args, view_kwargs)
+
+
+class BrowserSessionMiddleware(BrowserOnlyMixin, SessionMiddleware):
+    pass
+
+
+class BrowserCsrfViewMiddleware(BrowserOnlyMixin, CsrfViewMiddleware):
+    pass
+
+
+class BrowserAuthenticationMiddleware(BrowserOnlyMixin, AuthenticationMiddleware):
+    pass
+
+
+class BrowserMessageMiddleware(BrowserOnlyMixin, MessageMiddleware):
+    pass
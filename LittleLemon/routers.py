@@ -0,0 +1,117 @@
+"""
+Database routers for the LittleLemon project.
+
+PrimaryReplicaRouter sends safe reads to the aliases listed in
+settings.DATABASE_REPLICAS and every write to the primary ('default').
+Reads made while handling a write request, or by a user who wrote within
+the last REPLICA_PIN_SECONDS, stay on the primary so users always read
+their own writes.
+
+ShardRouter comes first and sends the order tables to the database of the
+request's restaurant location instead.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+
+from .sharding import is_sharded, current_shard
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request_state = ContextVar('db_request_state', default=None)
+
+
+def pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def resolved_user(request):
+    """
+    Return the authenticated user of a request without triggering authentication.
+    Session users are resolved lazily by AuthenticationMiddleware, JWT users are
+    set on the request by DRF once the view has authenticated it.
+    """
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    return user
+
+
+class RequestRoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.pinned = request.method not in SAFE_METHODS
+        self.user_checked = False
+
+    def primary_pinned(self):
+        if self.pinned or self.user_checked:
+            return self.pinned
+        user = resolved_user(self.request)
+        if user is not None:
+            # Set before the lookup, a database cache backend routes its own reads through here
+            self.user_checked = True
+            self.pinned = bool(cache.get(pin_key(user.pk)))
+        return self.pinned
+
+
+def start_request(request):
+    return _request_state.set(RequestRoutingState(request))
+
+
+def end_request(token):
+    _request_state.reset(token)
+
+
+def current_state():
+    return _request_state.get()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and not is_sharded(type(instance)):
+            # Follow relations on the database the instance was loaded from,
+            # unless it came from a location shard that only holds the order tables
+            return instance._state.db
+
+        state = current_state()
+        if state is None or not settings.DATABASE_REPLICAS or state.primary_pinned():
+            # Outside of a request (management commands, shell) always read the primary
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = current_state()
+        if state is not None:
+            state.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ShardRouter:
+    """
+    Send the sharded models (carts, orders, see LittleLemon/sharding.py) to the
+    database of the current location. Other models fall through to the next router.
+    """
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and is_sharded(type(instance)):
+            # Items of an order come from the order's shard
+            return instance._state.db
+        return current_shard()
+
+    db_for_write = db_for_read
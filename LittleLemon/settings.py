@@ -47,15 +47,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemon.middleware.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'LittleLemon.middleware.ReplicaPinningMiddleware',
+    'LittleLemon.middleware.LocationMiddleware',
+    'LittleLemon.middleware.BrowserSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'LittleLemon.middleware.BrowserCsrfViewMiddleware',
+    'LittleLemon.middleware.BrowserAuthenticationMiddleware',
+    'LittleLemon.middleware.BrowserMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# JWT requests to these paths skip the session, CSRF, authentication and
+# messages middleware (the Browser* middleware above)
+STATELESS_PATH_PREFIXES = ['/api/']
+
 ROOT_URLCONF = 'LittleLemon.urls'
 
 TEMPLATES = [
@@ -90,6 +97,67 @@ DATABASES = {
     }
 }
 
+# Read replicas, by alias in DATABASES. Safe reads are spread over them,
+# writes and reads that must see a user's own recent writes go to 'default'.
+# For local testing SQLite files can stand in for replicas, e.g.
+#   DATABASES['replica1'] = {
+#       'ENGINE': 'django.db.backends.sqlite3',
+#       'NAME': BASE_DIR / 'replica1.sqlite3',
+#       'TEST': {'MIRROR': 'default'},
+#   }
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ['LittleLemon.routers.ShardRouter', 'LittleLemon.routers.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write
+REPLICA_PIN_SECONDS = 5
+
+# Restaurant locations and the database holding the carts and orders of each,
+# see LittleLemon/sharding.py. Requests pick a location with the X-Location
+# header or ?location=, DEFAULT_LOCATION otherwise. Every database listed gets
+# the full schema from migrate --database. Locally SQLite files can act as shards, e.g.
+#   DATABASES['downtown'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'downtown.sqlite3'}
+#   ORDER_SHARDS['downtown'] = 'downtown'
+ORDER_SHARDS = {'main': 'default'}
+DEFAULT_LOCATION = 'main'
+
+
+# Admission control, see LittleLemon/admission.py
+# Requests handled at once by a worker process
+ADMISSION_MAX_CONCURRENCY = 8
+# Priority classes, highest first, and the rules sorting requests into them:
+# (class, methods or None for any, path prefix), first match wins
+ADMISSION_CLASSES = ['checkout', 'orders', 'browsing']
+ADMISSION_RULES = [
+    ('checkout', ['POST'], '/api/orders/'),
+    ('checkout', None, '/api/cart/'),
+    ('orders', None, '/api/orders/'),
+    ('browsing', None, '/api/menu'),
+    ('browsing', None, '/api/categories/'),
+    ('browsing', ['GET', 'HEAD'], '/about/'),
+    ('browsing', ['GET', 'HEAD'], '/menu'),
+    ('browsing', ['GET', 'HEAD'], '/api/bookings/availability/'),
+]
+ADMISSION_DEFAULT_CLASS = 'orders'
+# Average queueing time above which the lowest class is shed (twice that for the next one)
+ADMISSION_LATENCY_TARGET_MS = 250
+# Longest a request waits for a slot before it gets a 503
+ADMISSION_MAX_WAIT_MS = 5000
+ADMISSION_RETRY_AFTER_SECONDS = 2
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (Redis, Memcached) in production so that
+# replica pinning, cached counts, the website's cached pages and its
+# menu version are seen by every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -157,8 +225,8 @@ REST_FRAMEWORK = {
     },
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
+        'LittleLemonAPI.filters.RemoteSearchFilter',
+        'LittleLemonAPI.filters.RemoteOrderingFilter',
     ],
     'SEARCH_PARAM': 'search',
     'ORDERING_PARAM': 'ordering',
@@ -170,8 +238,8 @@ REST_FRAMEWORK = {
         'title': ['asc', 'desc'],
         'price': ['asc', 'desc'],
     },
-    'DEFAULT_METADATA_CLASS': 'rest_framework.metadata.SimpleMetadata',
-    'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
+    'DEFAULT_METADATA_CLASS': 'LittleLemonAPI.schema.CachedMetadata',
+    'DEFAULT_SCHEMA_CLASS': 'LittleLemonAPI.schema.ApiAutoSchema',
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.AcceptHeaderVersioning',
 }
 
@@ -180,7 +248,100 @@ DJOSER = {
     "LOGIN_FIELD": "email",
 }
 
+# Maximum number of changes returned by one call to the delta-sync feed
+CHANGES_FEED_LIMIT = 500
+# Seconds a change log row must be old before the feed hands it out. Ids are
+# taken on insert but rows become visible on commit, so a younger row can still
+# be joined by a lower id from a transaction that has not committed yet
+CHANGES_FEED_SETTLE_SECONDS = 5
+# Days change log rows are kept, older ones are deleted by the prune_change_log
+# command. Clients whose token is older have to sync from scratch
+CHANGES_FEED_RETENTION_DAYS = 30
+
+# Most users accepted by one batch group membership request
+GROUP_BATCH_MAX_USERS = 1000
+
+# Listings of tables with at least this many rows use the table statistics
+# instead of an exact COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 10000
+# Seconds an exact count over that threshold is reused by the paginated API lists
+COUNT_CACHE_SECONDS = 60
+# Seconds the cart summary (lines, items, total) of a user is cached,
+# cart writes invalidate it before that
+CART_SUMMARY_CACHE_SECONDS = 300
+
+# Best sellers listed per category by /api/menu/top/, by default and at most
+MENU_TOP_DEFAULT = 3
+MENU_TOP_MAX = 20
+
+# Restaurant website: seconds rendered pages stay cached, menu items per page
+PAGE_CACHE_SECONDS = 600
+MENU_PAGE_SIZE = 12
+
+# Restaurant bookings: bookable slots (hour of the day), tables per slot,
+# and the longest range answered by the availability calendar
+BOOKING_SLOTS = list(range(10, 22))
+BOOKING_TABLES = 6
+BOOKING_CALENDAR_DAYS = 30
+
+# Delivered orders older than this many days are moved to the archive tables
+# by the archive_orders command
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# Cart lines untouched for this many days are deleted by the purge_carts command
+CART_EXPIRY_DAYS = 7
+# Rows deleted per statement by the purge commands
+PURGE_BATCH_SIZE = 1000
+
+# Hours the response to an Idempotency-Key request is kept for replay,
+# expired keys are deleted by the prune_idempotency_keys command
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+# Seconds a request holds its Idempotency-Key before a retry may take it over,
+# keep it above the longest time a worker may spend on a request
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# OpenAPI schema written by the generate_schema command, built on first use
+# when missing, and how long clients may cache /api/schema/ (seconds)
+SCHEMA_FILE = BASE_DIR / 'openapi.json'
+SCHEMA_CACHE_SECONDS = 3600
+
+# Fraction of API requests profiled (0 disables sampling, staff can still
+# profile a request with the X-Profile header) and how many profiles are kept
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_MAX_CAPTURES = 100
+
+# Build URL patterns, serializers, the schema and cache connections when a
+# server loads wsgi.py or asgi.py, so that a worker's first request does not
+# pay for them (management commands skip it), see LittleLemonAPI/warmup.py
+WARM_UP_ON_START = False
+
+# Background jobs, see LittleLemonAPI/jobs.py and the runjobs command
+JOB_BATCH_SIZE = 50
+JOB_POLL_SECONDS = 1.0
+JOB_MAX_ATTEMPTS = 5
+# Seconds after which a running job whose worker died is picked up again
+JOB_LOCK_TIMEOUT_SECONDS = 300
+
+# Where relay_outbox delivers order and menu events (a class with send(messages)
+# and close(), built with OUTBOX_SINK_OPTIONS), see LittleLemonAPI/outbox.py
+OUTBOX_SINK = 'LittleLemonAPI.outbox.NDJSONSink'
+OUTBOX_SINK_OPTIONS = {'path': BASE_DIR / 'outbox.ndjson'}
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_SECONDS = 1.0
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'LittleLemonAPI.tokens.TokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'LittleLemonAPI.tokens.TokenBlacklistSerializer',
 }
+
+# Refresh token revocation checks read an in-memory set of blacklisted tokens,
+# updated with new blacklist rows at most this often (seconds)
+TOKEN_REVOCATION_REFRESH_SECONDS = 5
+# and reloaded in full, dropping expired tokens, this often
+TOKEN_REVOCATION_RELOAD_SECONDS = 3600
+# Blacklist rows younger than this are read again on every update, so a row
+# that committed after rows with higher ids is still picked up (seconds)
+TOKEN_REVOCATION_COMMIT_WINDOW_SECONDS = 60
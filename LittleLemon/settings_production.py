@@ -0,0 +1,63 @@
+"""
+Production settings for API workers.
+
+Loads the project settings and drops what an API-only worker never uses: the
+admin and its session/messages stack, the browsable API, and the token and
+session authentication classes. Use it with
+
+    DJANGO_SETTINGS_MODULE=LittleLemon.settings_production
+
+Run the admin from a separate worker on LittleLemon.settings. The
+profile_startup command shows the import cost of each app under either module.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+DROPPED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DROPPED_APPS]
+
+# JWT requests need no session, CSRF (DRF views are CSRF exempt without
+# SessionAuthentication), messages or frame options
+MIDDLEWARE = [
+    'LittleLemon.middleware.AdmissionControlMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'LittleLemon.middleware.ReplicaPinningMiddleware',
+    'LittleLemon.middleware.LocationMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    'django.template.context_processors.request',
+]
+
+# Keep database connections open between requests
+for alias in DATABASES:
+    DATABASES[alias]['CONN_MAX_AGE'] = 60
+    DATABASES[alias]['CONN_HEALTH_CHECKS'] = True
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ),
+}
+
+# Resolve URLs and build serializers when the worker starts, not on its first request
+WARM_UP_ON_START = True
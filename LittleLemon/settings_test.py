@@ -0,0 +1,37 @@
+"""
+Settings for the test suite.
+
+SQLite in place of MySQL, with a second database acting as the shard of a
+'downtown' location so the tests cover the cross-shard paths, and a replica
+of 'default' for tests that set DATABASE_REPLICAS. Run with
+
+    python manage.py test --settings LittleLemon.settings_test
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-default.sqlite3',
+    },
+    'downtown': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-downtown.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-default.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+ORDER_SHARDS = {'main': 'default', 'downtown': 'downtown'}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# The rate limits of the API would throttle the suite
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'anon': None, 'user': None},
+}
@@ -0,0 +1,151 @@
+"""
+Location sharding for the LittleLemon project.
+
+Carts, orders, their archive and the POS ingest checkpoints of each restaurant
+location live in the database given by settings.ORDER_SHARDS. The location of a
+request comes from the X-Location header or ?location= (LocationMiddleware),
+DEFAULT_LOCATION otherwise, and ShardRouter sends those models to its database.
+Code outside of a request picks a location with using_location().
+
+Order lists can read every location at once with ?location=all: the query runs
+on each shard in parallel (fan_out) and the rows are merged in the queryset's
+order by ShardedQuerySet.
+
+Work recorded alongside an order (change log rows, outbox events, jobs) is
+written to the order's shard, inside the order's transaction. Idempotency keys
+live in the shard too, next to the carts and orders they guard.
+
+Every database carries the full schema, only the sharded tables and those
+records are used outside 'default'. Their foreign keys to users and menu items have no database constraint,
+those rows stay in 'default'.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+ALL = 'all'
+SHARDED_APP = 'LittleLemonAPI'
+SHARDED_MODELS = {'cart', 'order', 'orderitem', 'archivedorder', 'archivedorderitem', 'ingestcheckpoint',
+                  'idempotencykey'}
+
+_location = ContextVar('location', default=None)
+
+
+def is_sharded(model):
+    return model._meta.app_label == SHARDED_APP and model._meta.model_name in SHARDED_MODELS
+
+
+def current_location():
+    return _location.get() or settings.DEFAULT_LOCATION
+
+
+def shard_for(location):
+    if location == ALL:
+        location = settings.DEFAULT_LOCATION
+    return settings.ORDER_SHARDS[location]
+
+
+def current_shard():
+    """ The database holding the sharded tables of the current location """
+    return shard_for(current_location())
+
+
+def shard_aliases():
+    """ Every database holding sharded tables, once each """
+    return list(dict.fromkeys(settings.ORDER_SHARDS.values()))
+
+
+def location_of(alias):
+    """ The location whose rows live in a database """
+    for location, shard in settings.ORDER_SHARDS.items():
+        if shard == alias:
+            return location
+    return settings.DEFAULT_LOCATION
+
+
+def set_location(location):
+    return _location.set(location)
+
+
+def reset_location(token):
+    _location.reset(token)
+
+
+@contextmanager
+def using_location(location):
+    token = set_location(location)
+    try:
+        yield shard_for(location)
+    finally:
+        reset_location(token)
+
+
+def fan_out(function, locations=None):
+    """
+        Call function(alias) for each location, in parallel threads with the location set.
+        Returns {location: result}.
+    """
+    locations = list(locations or settings.ORDER_SHARDS)
+
+    def run(location):
+        with using_location(location) as alias:
+            try:
+                return function(alias)
+            finally:
+                # Each thread opened its own connection
+                connections[alias].close()
+
+    if len(locations) == 1:
+        with using_location(locations[0]) as alias:
+            return {locations[0]: function(alias)}
+    with ThreadPoolExecutor(len(locations)) as pool:
+        return dict(zip(locations, pool.map(run, locations)))
+
+
+def ordering_terms(queryset):
+    return [term for term in (queryset.query.order_by or queryset.model._meta.ordering) if isinstance(term, str)]
+
+
+class ShardedQuerySet:
+    """
+        A queryset read from every shard, for paginated lists.
+        count() adds up the count of each shard. A slice fetches the rows up to its end
+        from each shard and merges them in the queryset's ordering, so page n costs
+        n pages per shard.
+    """
+    ordered = True
+
+    def __init__(self, queryset, locations=None):
+        self.terms = ordering_terms(queryset)
+        related = [term for term in self.terms if '__' in term]
+        if related:
+            # A related field would be a JOIN to a table that only 'default' holds
+            raise ValueError(f"ShardedQuerySet cannot order by related fields: {', '.join(related)}")
+        # Sort on values selected by the query
+        self.queryset = queryset.annotate(**{f'_shard_sort_{i}': F(term.lstrip('-'))
+                                             for i, term in enumerate(self.terms)})
+        self.model = queryset.model
+        self.locations = locations
+
+    def count(self):
+        return sum(fan_out(lambda alias: self.queryset.using(alias).count(), self.locations).values())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.stop is None:
+            raise TypeError("ShardedQuerySet only supports slices with an end")
+        stop = key.stop
+        shards = fan_out(lambda alias: list(self.queryset.using(alias)[:stop]), self.locations)
+        rows = [row for location_rows in shards.values() for row in location_rows]
+        # Stable sorts from the least significant term keep each earlier term's order
+        for i, term in reversed(list(enumerate(self.terms))):
+            value = attrgetter(f'_shard_sort_{i}')
+            rows.sort(key=lambda row: (value(row) is not None, value(row)), reverse=term.startswith('-'))
+        return rows[key]
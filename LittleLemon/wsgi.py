@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
 
 application = get_wsgi_application()
+
+# Warm up here rather than in AppConfig.ready(), which every management command runs
+from LittleLemonAPI.warmup import warm_up_on_start  # noqa: E402
+
+warm_up_on_start()
@@ -1,9 +1,150 @@
-from django.contrib import admin
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import router, transaction
+from django.utils.functional import cached_property
+
+from .models import Category, MenuItem, Cart, Order, OrderItem, ChangeLog
+from .carts import invalidate_summaries
+from .changelog import record_changes
+from .outbox import publish, order_updated, menuitem_price_changed, ORDER_UPDATED, MENUITEM_PRICE_CHANGED
+from .counts import estimated_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """ Use the table statistics instead of COUNT(*) for unfiltered changelists of large tables """
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['title', 'slug']
+    search_fields = ['title']
+
+
+class MenuItemAdmin(admin.ModelAdmin):
+    list_display = ['title', 'price', 'category', 'featured']
+    list_select_related = ['category']
+    list_filter = ['featured']
+    search_fields = ['title']
+    autocomplete_fields = ['category']
+
+    def save_model(self, request, obj, form, change):
+        # The change view runs in a transaction on the menu's database, the event commits with the save
+        super().save_model(request, obj, form, change)
+        if change and 'price' in form.changed_data:
+            publish(MenuItem, obj._state.db, [
+                (obj.id, MENUITEM_PRICE_CHANGED, menuitem_price_changed(obj, form.initial['price'])),
+            ])
+
+
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'menuitem', 'quantity', 'price']
+    # An empty list, not the default False, which would select_related() every foreign key
+    list_select_related = []
+    autocomplete_fields = ['user', 'menuitem']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Users and menu items are in 'default', not in the cart's shard: prefetch them from there
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('user', 'menuitem')
+
+    # Saves invalidate the cart summary through post_save, deletes do it here
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_summaries([obj.user_id], obj._state.db)
+
+    def delete_queryset(self, request, queryset):
+        users = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_summaries(users, queryset.db)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    autocomplete_fields = ['menuitem']
+    extra = 0
+
+
+class OrderActionForm(ActionForm):
+    delivery_crew = forms.ModelChoiceField(
+        queryset=User.objects.filter(groups__name='Delivery Crew'),
+        required=False,
+        help_text='Used by "Assign delivery crew"',
+    )
+
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
+    list_select_related = []
+    list_filter = ['status']
+    date_hierarchy = 'date'
+    raw_id_fields = ['user', 'delivery_crew']
+    inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = OrderActionForm
+    actions = ['assign_delivery_crew', 'mark_delivered']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('user', 'delivery_crew')
+
+    def log_changes(self, rows, changes):
+        # QuerySet.update() does not send post_save, keep the changes feed and the outbox in step
+        using = router.db_for_write(Order)
+        record_changes(Order, rows, ChangeLog.UPDATED, using)
+        publish(Order, using, [
+            (order_id, ORDER_UPDATED, order_updated(order_id, changes)) for order_id, _ in rows
+        ])
+
+    @admin.action(description='Assign delivery crew')
+    def assign_delivery_crew(self, request, queryset):
+        try:
+            crew = OrderActionForm.base_fields['delivery_crew'].clean(request.POST.get('delivery_crew'))
+        except ValidationError:
+            crew = None
+        if crew is None:
+            self.message_user(request, 'Select a delivery crew member to assign.', messages.ERROR)
+            return
+        with transaction.atomic(using=router.db_for_write(Order)):
+            rows = list(queryset.values_list('id', 'user_id'))
+            updated = Order.objects.filter(pk__in=[pk for pk, _ in rows]).update(delivery_crew=crew)
+            self.log_changes(rows, {'delivery_crew_id': crew.id})
+        self.message_user(request, f'Assigned {updated} orders.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected orders as delivered')
+    def mark_delivered(self, request, queryset):
+        with transaction.atomic(using=router.db_for_write(Order)):
+            rows = list(queryset.filter(status=False).values_list('id', 'user_id'))
+            updated = Order.objects.filter(pk__in=[pk for pk, _ in rows]).update(status=True)
+            self.log_changes(rows, {'status': True})
+        self.message_user(request, f'Marked {updated} orders as delivered.', messages.SUCCESS)
+
+
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'menuitem', 'quantity', 'price']
+    list_select_related = ['order']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['menuitem']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('menuitem')
+
 
 # Register your models here.
-admin.site.register(Category)
-admin.site.register(MenuItem)
-admin.site.register(Cart)
-admin.site.register(Order)
-admin.site.register(OrderItem)
\ No newline at end of file
+admin.site.register(Category, CategoryAdmin)
+admin.site.register(MenuItem, MenuItemAdmin)
+admin.site.register(Cart, CartAdmin)
+admin.site.register(Order, OrderAdmin)
+admin.site.register(OrderItem, OrderItemAdmin)
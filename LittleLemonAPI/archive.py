@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from LittleLemon.sharding import current_shard
+
+from .changelog import archiving
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+"""
+    Archival of delivered orders.
+
+    Orders are moved in batches, each batch copied to the archive tables and deleted
+    from the hot tables in one transaction. An interrupted run loses nothing and the
+    next run carries on with the orders that are left. The changes feed reports the
+    moved orders as archived, not deleted.
+"""
+
+
+def archivable_orders(older_than_days):
+    cutoff = timezone.localdate() - timedelta(days=older_than_days)
+    return Order.objects.filter(status=True, date__lt=cutoff)
+
+
+def archive_batch(older_than_days, batch_size):
+    """
+        Move up to batch_size delivered orders older than older_than_days of the current location,
+        returns the number moved. The archive tables are sharded with the orders.
+    """
+    with transaction.atomic(using=current_shard()):
+        orders = list(archivable_orders(older_than_days).order_by('id')[:batch_size])
+        if not orders:
+            return 0
+        ids = [order.id for order in orders]
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(id=order.id, user_id=order.user_id, delivery_crew_id=order.delivery_crew_id,
+                          status=order.status, total=order.total, date=order.date)
+            for order in orders
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(order_id=item.order_id, menuitem_id=item.menuitem_id,
+                              quantity=item.quantity, price=item.price)
+            for item in OrderItem.objects.filter(order_id__in=ids)
+        ])
+        with archiving():
+            Order.objects.filter(id__in=ids).delete()
+    return len(ids)
@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, MenuItem
+from .serializers import CartSummarySerializer
+
+"""
+    Set-based cart writes, done in SQL rather than row by row through the ORM,
+    and the cached cart summary.
+
+    The summary of a user's cart (lines, items, total) is one aggregate query,
+    cached per user and location database for CART_SUMMARY_CACHE_SECONDS,
+    already serialized so the total renders as a string.
+    Cart.save() invalidates it through the post_save signal, writes that bypass
+    the signal (the upserts below, QuerySet.update() and delete()) call
+    invalidate_summaries() themselves.
+"""
+
+UPSERT = {
+    'mysql': (
+        "ON DUPLICATE KEY UPDATE "
+        "{cart}.quantity = {cart}.quantity + VALUES(quantity), "
+        "{cart}.unit_price = VALUES(unit_price), "
+        "{cart}.price = VALUES(unit_price) * {cart}.quantity, "
+        "{cart}.touched_at = VALUES(touched_at)"
+    ),
+    'default': (
+        "ON CONFLICT (menuitem_id, user_id) DO UPDATE SET "
+        "quantity = {cart}.quantity + excluded.quantity, "
+        "unit_price = excluded.unit_price, "
+        "price = excluded.unit_price * ({cart}.quantity + excluded.quantity), "
+        "touched_at = excluded.touched_at"
+    ),
+}
+
+
+def add_to_cart(user, lines, using='default'):
+    """
+        Add (menuitem_id, quantity, unit_price) lines to the user's cart in one INSERT,
+        adding to the quantity of lines already in the cart.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    cart = qn(Cart._meta.db_table)
+    upsert = UPSERT.get(connection.vendor, UPSERT['default']).format(cart=cart)
+    now = timezone.now()
+
+    rows = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(lines))
+    params = [value for menuitem_id, quantity, unit_price in lines
+              for value in (user.pk, menuitem_id, quantity, unit_price, unit_price * quantity, now)]
+    sql = (
+        f"INSERT INTO {cart} (user_id, menuitem_id, quantity, unit_price, price, touched_at) "
+        f"VALUES {rows} {upsert}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    invalidate_summaries([user.pk], using)
+
+
+def copy_order_to_cart(user, order_id, item_model, using='default'):
+    """
+        Add the items of an order to the user's cart at the current menu prices,
+        in one INSERT ... SELECT that adds to the quantity of lines already in the cart.
+        Items whose menu item no longer exists are left out by the join.
+        A location shard does not hold the menu, there the prices are read first.
+    """
+    if using != router.db_for_write(MenuItem):
+        lines = list(item_model.objects.using(using).filter(order_id=order_id).values_list('menuitem_id', 'quantity'))
+        prices = dict(MenuItem.objects.filter(id__in=[menuitem_id for menuitem_id, _ in lines])
+                      .values_list('id', 'price'))
+        lines = [(menuitem_id, quantity, prices[menuitem_id]) for menuitem_id, quantity in lines if menuitem_id in prices]
+        if lines:
+            add_to_cart(user, lines, using)
+        return
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    cart, items, menu = (qn(model._meta.db_table) for model in (Cart, item_model, MenuItem))
+    upsert = UPSERT.get(connection.vendor, UPSERT['default']).format(cart=cart)
+
+    # MySQL applies the assignments in order, so the price is computed from the updated quantity
+    sql = (
+        f"INSERT INTO {cart} (user_id, menuitem_id, quantity, unit_price, price, touched_at) "
+        f"SELECT %s, i.menuitem_id, i.quantity, m.price, m.price * i.quantity, %s "
+        f"FROM {items} i INNER JOIN {menu} m ON m.id = i.menuitem_id "
+        f"WHERE i.order_id = %s "
+        f"{upsert}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, timezone.now(), order_id])
+    invalidate_summaries([user.pk], using)
+
+
+def summary_key(user_id, using):
+    return f'cart-summary:{using}:{user_id}'
+
+
+def cart_summary(user):
+    """ Number of lines, number of items and total of the user's cart at the current location """
+    using = router.db_for_read(Cart)
+    key = summary_key(user.pk, using)
+    summary = cache.get(key)
+    if summary is None:
+        summary = CartSummarySerializer(Cart.objects.using(using).filter(user=user).aggregate(
+            lines=Count('id'),
+            items=Coalesce(Sum('quantity'), 0),
+            total=Coalesce(Sum('price'), Value(Decimal('0.00'))),
+        )).data
+        cache.set(key, summary, settings.CART_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_summaries(user_ids, using):
+    """ Drop the cached summaries of carts changed in database using, once the change is committed """
+    keys = [summary_key(user_id, using) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys), using=using)
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from LittleLemon.sharding import ALL, current_location
+
+from .models import ChangeLog, Category, MenuItem, Order
+
+"""
+    The change log records which rows of the synced models were created, updated or deleted.
+    Rows are written by the model signals, and by record_changes() for bulk writes
+    (bulk_create, QuerySet.update) that bypass the signals.
+
+    Each row is written to the database the change is written to, in the change's
+    transaction: catalog changes to 'default', order changes to the shard of the
+    order's location, tagged with that location since several locations can share a shard.
+
+    Orders deleted by the archiver are logged as archived, not deleted, see archiving().
+"""
+
+TRACKED_MODELS = {
+    Category: 'category',
+    MenuItem: 'menuitem',
+    Order: 'order',
+}
+
+
+def owner_id(instance):
+    """ Orders are private to the user who placed them, catalog rows are public """
+    if isinstance(instance, Order):
+        return instance.user_id
+    return None
+
+
+_deleted_action = ContextVar('deleted_action', default=ChangeLog.DELETED)
+
+
+@contextmanager
+def archiving():
+    """ Log the rows deleted inside as archived: they moved to the archive tables """
+    token = _deleted_action.set(ChangeLog.ARCHIVED)
+    try:
+        yield
+    finally:
+        _deleted_action.reset(token)
+
+
+def deleted_action():
+    return _deleted_action.get()
+
+
+def change_location(model):
+    """ The location of an order change, None for catalog changes """
+    if model is not Order:
+        return None
+    location = current_location()
+    return settings.DEFAULT_LOCATION if location == ALL else location
+
+
+def record_change(instance, action):
+    ChangeLog.objects.using(instance._state.db).create(
+        model=TRACKED_MODELS[type(instance)],
+        object_id=instance.pk,
+        action=action,
+        user_id=owner_id(instance),
+        location=change_location(type(instance)),
+    )
+
+
+def record_changes(model, rows, action, using):
+    """
+        Log a bulk write to the database using in one INSERT.
+        rows is an iterable of (object_id, user_id) pairs.
+    """
+    location = change_location(model)
+    ChangeLog.objects.using(using).bulk_create([
+        ChangeLog(model=TRACKED_MODELS[model], object_id=object_id, action=action, user_id=user_id,
+                  location=location)
+        for object_id, user_id in rows
+    ])
@@ -0,0 +1,64 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+"""
+    Row counts from the database statistics, for listings where an exact COUNT(*)
+    over a large table costs more than the page itself.
+"""
+
+TABLE_STATISTICS = {
+    'mysql': "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+}
+
+
+def estimated_count(queryset):
+    """
+        The estimated number of rows of an unfiltered queryset's table.
+        Returns None for filtered querysets and for databases without table statistics.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.is_sliced or query.combinator:
+        return None
+
+    connection = connections[queryset.db]
+    sql = TABLE_STATISTICS.get(connection.vendor)
+    if sql is None:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def approximate_count(queryset):
+    """
+        Count the rows of a queryset, cheaply when it is large.
+        Returns (count, approximate). Unfiltered querysets over ESTIMATED_COUNT_THRESHOLD rows
+        use the table statistics, other counts over the threshold are cached for COUNT_CACHE_SECONDS.
+    """
+    threshold = settings.ESTIMATED_COUNT_THRESHOLD
+    estimate = estimated_count(queryset)
+    if estimate is not None and estimate >= threshold:
+        return estimate, True
+
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0, False
+    key = 'count:' + hashlib.sha1(f"{queryset.db}:{sql}:{params}".encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    count = queryset.count()
+    if count >= threshold:
+        cache.set(key, count, settings.COUNT_CACHE_SECONDS)
+    return count, False
@@ -0,0 +1,97 @@
+from django.db.models import Case, IntegerField, Q, Value, When
+from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .models import Order, ArchivedOrder
+
+"""
+    Filters for the order lists.
+
+    Every filter maps onto an index of the orders table: user, delivery_crew and
+    status are each the leading column of a composite index with date, so they can
+    be combined with a date range and the default newest-first ordering. total has
+    its own index for range filters.
+
+    Carts and orders live in the shard of their location, users and menu items in
+    'default', so searching or ordering them by a field of those models cannot be a
+    JOIN. RemoteSearchFilter and RemoteOrderingFilter look the related rows up in
+    their own database and filter or rank by their ids instead.
+"""
+
+ORDER_FILTER_FIELDS = {
+    'user': ['exact'],
+    'delivery_crew': ['exact', 'isnull'],
+    'status': ['exact'],
+    'date': ['exact', 'gte', 'lte'],
+    'total': ['gte', 'lte'],
+}
+
+
+class OrderFilter(filters.FilterSet):
+    """ ?user=, ?delivery_crew=, ?status=, ?date__gte=&date__lte= and ?total__gte=&total__lte= """
+    class Meta:
+        model = Order
+        fields = ORDER_FILTER_FIELDS
+
+
+class ArchivedOrderFilter(filters.FilterSet):
+    """ The same filters over the archive tables, for ?archived=true """
+    class Meta:
+        model = ArchivedOrder
+        fields = ORDER_FILTER_FIELDS
+
+
+def related_model(model, field):
+    return model._meta.get_field(field).related_model
+
+
+class RemoteSearchFilter(SearchFilter):
+    """
+        SearchFilter that also searches view.remote_search_fields, (foreign key, field)
+        pairs such as ('user', 'username'): the matching ids are read from the related
+        model's database and the list is filtered with foreign key __in ids.
+    """
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        fields = getattr(view, 'remote_search_fields', None)
+        terms = self.get_search_terms(request)
+        if not fields or not terms:
+            return queryset
+
+        for term in terms:
+            conditions = Q()
+            for foreign_key, field in fields:
+                ids = related_model(queryset.model, foreign_key).objects.filter(
+                    **{f'{field}__icontains': term}).values_list('pk', flat=True)
+                conditions |= Q(**{f'{foreign_key}__in': list(ids)})
+            queryset = queryset.filter(conditions)
+        return queryset
+
+
+class RemoteOrderingFilter(OrderingFilter):
+    """
+        OrderingFilter that also orders by view.remote_ordering_fields, which map an
+        ordering field such as 'menuitem__title' to its foreign key. The related rows of
+        the list are sorted in their own database and the list is ordered by their rank.
+        Every related id of the list ends up in the query, keep it to short lists like a cart.
+    """
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        remote = getattr(view, 'remote_ordering_fields', None)
+        if not ordering or not remote:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = []
+        for term in ordering:
+            field = term.lstrip('-')
+            if field not in remote:
+                terms.append(term)
+                continue
+            foreign_key = remote[field]
+            ids = set(queryset.values_list(foreign_key, flat=True))
+            ranked = related_model(queryset.model, foreign_key).objects.filter(pk__in=ids) \
+                .order_by(field.split('__', 1)[1], 'pk').values_list('pk', flat=True)
+            rank = Case(*[When(**{foreign_key: pk}, then=Value(i)) for i, pk in enumerate(ranked)],
+                        default=Value(len(ids)), output_field=IntegerField())
+            terms.append(rank.desc() if term.startswith('-') else rank.asc())
+        return queryset.order_by(*terms)
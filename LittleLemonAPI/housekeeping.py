@@ -0,0 +1,88 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import router
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from LittleLemon.sharding import shard_aliases
+
+from .carts import invalidate_summaries
+from .models import Cart, ChangeLog, IdempotencyKey
+
+"""
+    Batched cleanup of tables that would otherwise grow forever.
+    Each batch is a short DELETE by primary key, so no long lock is held on the table.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def delete_in_batches(queryset, batch_size, pause=0.0):
+    """
+        Delete the rows of queryset batch_size at a time.
+        The filter is applied again in the DELETE, rows changed since the batch was read are kept.
+        Returns (rows deleted, seconds taken).
+    """
+    started = time.monotonic()
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        count, _ = queryset.filter(pk__in=ids).delete()
+        deleted += count
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return deleted, time.monotonic() - started
+
+
+def purge_expired_carts(expiry_days, batch_size, pause=0.0):
+    """ Purge the carts of every location shard """
+    cutoff = timezone.now() - timedelta(days=expiry_days)
+    deleted = seconds = 0
+    for alias in shard_aliases():
+        expired = Cart.objects.using(alias).filter(touched_at__lt=cutoff)
+        users = set(expired.values_list('user_id', flat=True).distinct())
+        shard_deleted, shard_seconds = delete_in_batches(expired, batch_size, pause)
+        invalidate_summaries(users, alias)
+        deleted += shard_deleted
+        seconds += shard_seconds
+    logger.info("Purged %d cart lines untouched for %d days in %.2fs", deleted, expiry_days, seconds)
+    return deleted, seconds
+
+
+def prune_expired_tokens(batch_size, pause=0.0):
+    """ Delete expired outstanding tokens, their blacklist entries go with them """
+    expired = OutstandingToken.objects.filter(expires_at__lt=timezone.now())
+    deleted, seconds = delete_in_batches(expired, batch_size, pause)
+    logger.info("Pruned %d expired token rows in %.2fs", deleted, seconds)
+    return deleted, seconds
+
+
+def prune_change_log(retention_days, batch_size, pause=0.0):
+    """ Delete the change log rows older than retention_days, in 'default' and every shard """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = seconds = 0
+    for alias in dict.fromkeys([router.db_for_write(ChangeLog), *shard_aliases()]):
+        alias_deleted, alias_seconds = delete_in_batches(
+            ChangeLog.objects.using(alias).filter(created_at__lt=cutoff), batch_size, pause)
+        deleted += alias_deleted
+        seconds += alias_seconds
+    logger.info("Pruned %d change log rows older than %d days in %.2fs", deleted, retention_days, seconds)
+    return deleted, seconds
+
+
+def prune_idempotency_keys(ttl_hours, batch_size, pause=0.0):
+    """ Delete the expired idempotency keys of every location shard """
+    cutoff = timezone.now() - timedelta(hours=ttl_hours)
+    deleted = seconds = 0
+    for alias in shard_aliases():
+        shard_deleted, shard_seconds = delete_in_batches(
+            IdempotencyKey.objects.using(alias).filter(created_at__lt=cutoff), batch_size, pause)
+        deleted += shard_deleted
+        seconds += shard_seconds
+    logger.info("Pruned %d idempotency keys older than %d hours in %.2fs", deleted, ttl_hours, seconds)
+    return deleted, seconds
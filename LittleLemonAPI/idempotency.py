@@ -0,0 +1,126 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.response import Response
+
+from LittleLemon.sharding import current_location
+
+from .models import IdempotencyKey
+
+"""
+    Idempotency-Key support for write endpoints.
+
+    The first request with a key runs the view and stores its response, retries with the
+    same key and body get the stored response back without running the view again.
+    Server errors are not stored, so the request can be retried for real.
+
+    Keys are kept in the shard of the request's location (see LittleLemon/sharding.py),
+    and the view runs in one transaction with the storing of its response, so the work
+    and its record commit together. A claim holds a lease of IDEMPOTENCY_LOCK_SECONDS:
+    a request whose worker died is retried once the lease runs out, and a request that
+    outlived its lease is rolled back when it finds the key taken over.
+"""
+
+HEADER = 'Idempotency-Key'
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path} {current_location()} {body}".encode()).hexdigest()
+
+
+def claim_key(user, key, request_fingerprint):
+    """
+        Return (record, created), replacing a record of the same key that has expired
+        and taking over one whose lease ran out before it stored a response
+    """
+    now = timezone.now()
+    expired_before = now - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=expired_before).delete()
+    try:
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user, key=key, defaults={'fingerprint': request_fingerprint, 'locked_at': now}
+        )
+    except IntegrityError:
+        # Lost a race with a concurrent request using the same key
+        record, created = IdempotencyKey.objects.get(user=user, key=key), False
+    if created:
+        return record, True
+
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    taken_over = IdempotencyKey.objects.filter(
+        Q(locked_at__lt=stale) | Q(locked_at__isnull=True), pk=record.pk, status_code__isnull=True,
+    ).update(fingerprint=request_fingerprint, locked_at=now)
+    if taken_over:
+        record.fingerprint, record.locked_at = request_fingerprint, now
+    return record, bool(taken_over)
+
+
+def replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        return Response({'error': f'{HEADER} was already used for a different request'}, status=422)
+    if record.status_code is None:
+        return in_progress()
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def in_progress():
+    response = Response({'error': f'A request with this {HEADER} is in progress'}, status=409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def response_body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    return json.loads(response.content) if response.content else None
+
+
+def idempotent(view_method):
+    """ Decorate a view's post() to honour the Idempotency-Key header """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': f'{HEADER} must be at most 255 characters'}, status=400)
+
+        request_fingerprint = fingerprint(request)
+        record, created = claim_key(request.user, key, request_fingerprint)
+        if not created:
+            return replay(record, request_fingerprint)
+
+        using = record._state.db
+        try:
+            with transaction.atomic(using=using):
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    # Only while the lease is still ours, the work rolls back otherwise
+                    stored = IdempotencyKey.objects.using(using).filter(
+                        pk=record.pk, locked_at=record.locked_at,
+                    ).update(status_code=response.status_code, response=response_body(response))
+                    if not stored:
+                        raise LeaseLost
+        except LeaseLost:
+            return in_progress()
+        except Exception:
+            IdempotencyKey.objects.using(using).filter(pk=record.pk, locked_at=record.locked_at).delete()
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyKey.objects.using(using).filter(pk=record.pk, locked_at=record.locked_at).delete()
+        return response
+    return wrapper
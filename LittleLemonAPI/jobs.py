@@ -0,0 +1,122 @@
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from LittleLemon.sharding import shard_aliases
+
+from .models import Job
+
+"""
+    A small database-backed job queue.
+
+    Register a handler with @job('name') and queue work with enqueue('name', **payload).
+    Enqueueing inside a transaction makes the job durable together with the change that caused it:
+    pass the transaction's database as using, jobs are queued and claimed in every shard as well.
+    Handlers registered with batched=True are called once per claimed batch with the list of payloads,
+    so a burst of jobs of the same kind costs one handler call.
+    Failed jobs are retried with exponential backoff until JOB_MAX_ATTEMPTS is reached.
+"""
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(name, batched=False):
+    def register(handler):
+        registry[name] = (handler, batched)
+        return handler
+    return register
+
+
+def job_aliases():
+    """ Every database jobs are queued in: the primary and each shard """
+    return list(dict.fromkeys([router.db_for_write(Job), *shard_aliases()]))
+
+
+def enqueue(name, delay=None, using=None, **payload):
+    if name not in registry:
+        raise KeyError(f"No job registered as '{name}'")
+    run_at = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.db_manager(using).create(name=name, payload=payload, run_at=run_at)
+
+
+def claim(batch_size, using):
+    """
+        Lock and mark as running up to batch_size due jobs of the database using.
+        Running jobs whose worker died are picked up again after JOB_LOCK_TIMEOUT_SECONDS.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    with transaction.atomic(using=using):
+        jobs = list(
+            Job.objects.using(using)
+            .select_for_update(skip_locked=connections[using].features.has_select_for_update_skip_locked)
+            .filter(Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale))
+            .order_by('run_at', 'id')[:batch_size]
+        )
+        Job.objects.using(using).filter(pk__in=[j.pk for j in jobs]).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+    for j in jobs:
+        j.attempts += 1
+    return jobs
+
+
+def retry_or_fail(jobs, error, using):
+    now = timezone.now()
+    for j in jobs:
+        if j.attempts >= settings.JOB_MAX_ATTEMPTS:
+            Job.objects.using(using).filter(pk=j.pk).update(status=Job.FAILED, locked_at=None, last_error=error)
+        else:
+            run_at = now + timedelta(seconds=2 ** j.attempts)
+            Job.objects.using(using).filter(pk=j.pk).update(
+                status=Job.QUEUED, locked_at=None, run_at=run_at, last_error=error)
+
+
+def run_batch(batch_size):
+    """ Run one batch of due jobs of each database, returns (jobs run, jobs failed) """
+    ran = failed = 0
+    for alias in job_aliases():
+        batch_ran, batch_failed = run_database_batch(batch_size, alias)
+        ran += batch_ran
+        failed += batch_failed
+    return ran, failed
+
+
+def run_database_batch(batch_size, using):
+    jobs = claim(batch_size, using)
+    by_name = defaultdict(list)
+    for j in jobs:
+        by_name[j.name].append(j)
+
+    done, failed = [], 0
+    for name, group in by_name.items():
+        if name not in registry:
+            retry_or_fail(group, f"No job registered as '{name}'", using)
+            failed += len(group)
+            continue
+
+        handler, batched = registry[name]
+        calls = [group] if batched else [[j] for j in group]
+        for call in calls:
+            try:
+                if batched:
+                    handler([j.payload for j in call])
+                else:
+                    handler(**call[0].payload)
+            except Exception:
+                logger.exception("Job '%s' failed", name)
+                retry_or_fail(call, traceback.format_exc(), using)
+                failed += len(call)
+            else:
+                done += [j.pk for j in call]
+
+    Job.objects.using(using).filter(pk__in=done).delete()
+    return len(jobs), failed
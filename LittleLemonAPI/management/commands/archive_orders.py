@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemon.sharding import using_location
+from LittleLemonAPI.archive import archive_batch
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than the archive age to the archive tables of their location, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help="Archive delivered orders placed more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help="Orders moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to wait between batches, to leave room for live traffic.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+        for location in settings.ORDER_SHARDS:
+            with using_location(location):
+                while True:
+                    moved = archive_batch(options['older_than_days'], options['batch_size'])
+                    if not moved:
+                        break
+                    total += moved
+                    self.stdout.write(f"Archived {total} orders ({location})")
+                    time.sleep(options['pause'])
+        self.stdout.write(f"Done, {total} orders archived in {time.monotonic() - started:.1f}s")
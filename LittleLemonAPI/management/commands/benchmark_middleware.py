@@ -0,0 +1,89 @@
+import statistics
+import time
+from collections import Counter
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class Command(BaseCommand):
+    help = ("Time JWT requests through the middleware stack with and without the stateless fast path "
+            "(STATELESS_PATH_PREFIXES) and report the per-request saving.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="User the JWT is issued for.")
+        parser.add_argument('--path', default='/api/schema/',
+                            help="Path requested. Throttled views answer 429 once the rate is spent, "
+                                 "the default path is not throttled.")
+        parser.add_argument('--requests', type=int, default=1000,
+                            help="Requests per round and mode.")
+        parser.add_argument('--rounds', type=int, default=5,
+                            help="Rounds, alternating between the modes.")
+        parser.add_argument('--session', action='store_true',
+                            help="Also send a session cookie of the user, like a client that logged in to the browsable API.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']!r}")
+
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+        session = None
+        if options['session']:
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+            session.update({
+                SESSION_KEY: str(user.pk),
+                BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+                HASH_SESSION_KEY: user.get_session_auth_hash(),
+            })
+            session.create()
+            headers['HTTP_COOKIE'] = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        modes = {
+            'full stack': override_settings(STATELESS_PATH_PREFIXES=[]),
+            'fast path': override_settings(STATELESS_PATH_PREFIXES=settings.STATELESS_PATH_PREFIXES),
+        }
+        timings = {mode: [] for mode in modes}
+        statuses = {mode: Counter() for mode in modes}
+        queries = {}
+        try:
+            for mode, overrides in modes.items():
+                with overrides, CaptureQueriesContext(connection) as captured:
+                    statuses[mode][handler.get_response(factory.get(options['path'], **headers)).status_code] += 1
+                queries[mode] = len(captured)
+
+            for _ in range(options['rounds']):
+                for mode, overrides in modes.items():
+                    with overrides:
+                        elapsed = 0.0
+                        for _ in range(options['requests']):
+                            request = factory.get(options['path'], **headers)
+                            started = time.perf_counter()
+                            response = handler.get_response(request)
+                            elapsed += time.perf_counter() - started
+                            statuses[mode][response.status_code] += 1
+                        timings[mode].append(elapsed / options['requests'])
+        finally:
+            if session is not None:
+                session.delete()
+
+        self.stdout.write(f"GET {options['path']}, {options['rounds']} x {options['requests']} requests per mode"
+                          f"{' with a session cookie' if session is not None else ''}")
+        for mode in modes:
+            codes = ', '.join(f'{code} x{count}' for code, count in sorted(statuses[mode].items()))
+            self.stdout.write(f"{mode:>10}: {statistics.median(timings[mode]) * 1e6:8.1f}us per request, "
+                              f"{queries[mode]} queries, responses {codes}")
+        saved = statistics.median(timings['full stack']) - statistics.median(timings['fast path'])
+        self.stdout.write(f"Saved {saved * 1e6:.1f}us per request "
+                          f"({saved / statistics.median(timings['full stack']) * 100:.0f}%)")
@@ -0,0 +1,20 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.schema import generate
+
+
+class Command(BaseCommand):
+    help = "Write the OpenAPI schema of the API to SCHEMA_FILE, served by /api/schema/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.SCHEMA_FILE),
+                            help="File to write, SCHEMA_FILE by default.")
+
+    def handle(self, *args, **options):
+        schema = generate()
+        with open(options['output'], 'w') as output:
+            json.dump(schema, output, indent=1)
+        self.stdout.write(f"Wrote {len(schema['paths'])} paths to {options['output']}")
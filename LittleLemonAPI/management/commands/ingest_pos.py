@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemon.sharding import using_location
+from LittleLemonAPI.models import MenuItem, IngestCheckpoint
+from LittleLemonAPI.popularity import record_orders
+from LittleLemonAPI.pos import write_batch
+from LittleLemonAPI.pos_records import read_records, init_worker, parse_chunk
+
+# Records sent to a worker process at a time
+CHUNK_SIZE = 500
+# Errors printed before the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def chunks(records, size):
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Ingest orders from an NDJSON or CSV POS export, resuming after the last ingested record."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The export file, .ndjson/.jsonl or .csv.")
+        parser.add_argument('--format', choices=['ndjson', 'csv'],
+                            help="Export format, by default from the file extension.")
+        parser.add_argument('--source',
+                            help="Checkpoint name of the export, the file name by default.")
+        parser.add_argument('--user',
+                            help="Username that owns records without a user, e.g. the counter account.")
+        parser.add_argument('--location', default=settings.DEFAULT_LOCATION, choices=list(settings.ORDER_SHARDS),
+                            help="Restaurant location the orders were taken at.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Orders written per transaction.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Processes parsing and validating records.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore the checkpoint and read the export from the start.")
+
+    def handle(self, *args, **options):
+        # Orders and the checkpoint are written to the location's shard
+        with using_location(options['location']):
+            self.ingest(options)
+
+    def ingest(self, options):
+        path = options['path']
+        export_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        source = options['source'] or os.path.basename(path)
+
+        default_user_id = None
+        if options['user']:
+            default_user_id = User.objects.filter(username=options['user']).values_list('id', flat=True).first()
+            if default_user_id is None:
+                raise CommandError(f"Unknown user {options['user']!r}")
+
+        skip = 0
+        if not options['restart']:
+            skip = IngestCheckpoint.objects.filter(source=source).values_list('position', flat=True).first() or 0
+            if skip:
+                self.stdout.write(f"Resuming {source} after record {skip}")
+
+        menu = {title: (menuitem_id, price) for menuitem_id, title, price
+                in MenuItem.objects.values_list('id', 'title', 'price')}
+
+        started = time.monotonic()
+        orders = items = rejected = duplicates = 0
+        errors = []
+        pending = deque()
+        batch = []
+        position = skip
+
+        def flush():
+            nonlocal orders, items, duplicates, rejected, batch
+            created, created_items, refused, skipped, order_ids = write_batch(
+                batch, source, position, default_user_id)
+            record_orders(order_ids)
+            orders += created
+            items += created_items
+            duplicates += skipped
+            rejected += len(refused)
+            errors.extend(f"{ref}: {error}" for ref, error in refused)
+            batch = []
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{position} records read, {orders} orders and {items} items written, "
+                              f"{orders / elapsed:.0f} orders/s, {(orders + items) / elapsed:.0f} rows/s")
+
+        def take(results):
+            nonlocal position, rejected
+            for result_position, record, error in results:
+                position = result_position
+                if error:
+                    rejected += 1
+                    errors.append(f"record {result_position}: {error}")
+                else:
+                    batch.append(record)
+                if len(batch) >= options['batch_size']:
+                    flush()
+
+        # Spawned on every platform: the workers only import pos_records, which needs no Django,
+        # and do not inherit this process's database connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(options['workers'], mp_context=context,
+                                 initializer=init_worker, initargs=(menu,)) as pool:
+            # Keep a couple of chunks per worker in flight, results are taken in file order
+            for chunk in chunks(read_records(path, export_format, skip), CHUNK_SIZE):
+                pending.append(pool.submit(parse_chunk, chunk, export_format))
+                if len(pending) >= options['workers'] * 2:
+                    take(pending.popleft().result())
+            while pending:
+                take(pending.popleft().result())
+        if batch or position > skip:
+            flush()
+
+        for error in errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(error)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Done in {elapsed:.1f}s: {orders} orders and {items} items written "
+                          f"({(orders + items) / elapsed if elapsed else 0:.0f} rows/s), "
+                          f"{duplicates} already ingested, {rejected} rejected")
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter so that nothing is imported yet
+STARTUP = """
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver()._populate()
+print(json.dumps({'setup': setup_done - started, 'urls': time.perf_counter() - setup_done}))
+"""
+
+
+def parse_importtime(output):
+    """ (module, self microseconds) from the lines written by python -X importtime """
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        yield fields[2].strip(), int(fields[0])
+
+
+def owner(module, app_names):
+    """ The installed app a module belongs to, or its top level package """
+    matches = [name for name in app_names if module == name or module.startswith(name + '.')]
+    if matches:
+        return max(matches, key=len)
+    return module.split('.')[0]
+
+
+class Command(BaseCommand):
+    help = "Start Django in a fresh interpreter and report the import time spent in each app and package."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help="Number of apps and packages listed.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')}
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        app_names = [app_config.name for app_config in apps.get_app_configs()]
+        totals = defaultdict(int)
+        modules = defaultdict(int)
+        for module, microseconds in parse_importtime(result.stderr):
+            name = owner(module, app_names)
+            totals[name] += microseconds
+            modules[name] += 1
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        self.stdout.write(f"Settings: {env['DJANGO_SETTINGS_MODULE']}")
+        self.stdout.write(f"django.setup() {timings['setup'] * 1000:.0f}ms, URL resolver {timings['urls'] * 1000:.0f}ms, "
+                          f"{sum(modules.values())} modules imported in {sum(totals.values()) / 1000:.0f}ms")
+        self.stdout.write(f"{'ms':>8} {'modules':>8}  app or package")
+        for name, microseconds in sorted(totals.items(), key=lambda item: -item[1])[:options['limit']]:
+            label = name if name in app_names else f"{name} (not an app)"
+            self.stdout.write(f"{microseconds / 1000:>8.1f} {modules[name]:>8}  {label}")
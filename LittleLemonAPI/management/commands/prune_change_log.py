@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.housekeeping import prune_change_log
+
+
+class Command(BaseCommand):
+    help = "Delete change log rows older than the changes feed keeps them, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.CHANGES_FEED_RETENTION_DAYS,
+                            help="Delete rows logged more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help="Rows deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        deleted, seconds = prune_change_log(options['retention_days'], options['batch_size'], options['pause'])
+        rate = deleted / seconds if seconds else 0
+        self.stdout.write(f"Deleted {deleted} change log rows in {seconds:.2f}s ({rate:.0f} rows/s)")
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.housekeeping import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than their time to live, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-hours', type=int, default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+                            help="Delete keys created more than this many hours ago.")
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help="Keys deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        deleted, seconds = prune_idempotency_keys(options['ttl_hours'], options['batch_size'], options['pause'])
+        rate = deleted / seconds if seconds else 0
+        self.stdout.write(f"Deleted {deleted} idempotency keys in {seconds:.2f}s ({rate:.0f} rows/s)")
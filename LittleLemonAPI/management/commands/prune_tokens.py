@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.housekeeping import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWT refresh tokens, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help="Tokens deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        deleted, seconds = prune_expired_tokens(options['batch_size'], options['pause'])
+        rate = deleted / seconds if seconds else 0
+        self.stdout.write(f"Deleted {deleted} token rows in {seconds:.2f}s ({rate:.0f} rows/s)")
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.housekeeping import purge_expired_carts
+
+
+class Command(BaseCommand):
+    help = "Delete cart lines that have not been touched for the cart expiry period, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expiry-days', type=int, default=settings.CART_EXPIRY_DAYS,
+                            help="Delete cart lines untouched for this many days.")
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help="Rows deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        deleted, seconds = purge_expired_carts(options['expiry_days'], options['batch_size'], options['pause'])
+        rate = deleted / seconds if seconds else 0
+        self.stdout.write(f"Deleted {deleted} cart lines in {seconds:.2f}s ({rate:.0f} rows/s)")
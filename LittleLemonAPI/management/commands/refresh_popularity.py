@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.popularity import refresh_scores, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the rolling 7 and 30 day sales and popularity of every menu item. Run once a day."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-days', type=int, default=0,
+                            help="First recount the daily sales rollup of this many days from the order items.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Menu items updated per statement.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['rebuild_days']:
+            scored = rebuild(options['rebuild_days'], options['batch_size'])
+        else:
+            scored = refresh_scores(batch_size=options['batch_size'])
+        self.stdout.write(f"Scored {scored} menu items with sales in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,65 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from LittleLemonAPI.outbox import outbox_aliases, relay_batch, sink
+
+
+class Command(BaseCommand):
+    help = ("Deliver the order and menu events of the outbox to OUTBOX_SINK in batches, "
+            "polling for new ones until interrupted. Run one relay per database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help="Relay only this database, can be repeated. Every database with events by default.")
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help="Events read and sent at a time.")
+        parser.add_argument('--poll', type=float, default=settings.OUTBOX_POLL_SECONDS,
+                            help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the outbox is empty instead of polling.")
+
+    def handle(self, *args, **options):
+        aliases = options['databases'] or outbox_aliases()
+        unknown = set(aliases) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f"Unknown databases: {', '.join(sorted(unknown))}")
+
+        events = sink()
+        totals = Counter()
+        started = time.monotonic()
+        try:
+            while True:
+                delivered = 0
+                for alias in aliases:
+                    delivered += self.relay(alias, events, options['batch_size'], totals)
+                if delivered:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            events.close()
+
+        elapsed = time.monotonic() - started
+        total = sum(totals.values())
+        self.stdout.write(f"Relayed {total} events in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} events/s)")
+        for event, count in totals.most_common():
+            self.stdout.write(f"{count:>10}  {event}")
+
+    def relay(self, alias, events, batch_size, totals):
+        batch_started = time.monotonic()
+        batch = relay_batch(alias, events, batch_size)
+        if not batch:
+            return 0
+        took = time.monotonic() - batch_started
+        totals.update(event.event for event in batch)
+        lag = (timezone.now() - batch[0].created_at).total_seconds()
+        self.stdout.write(f"{alias}: sent {len(batch)} events in {took * 1000:.0f}ms "
+                          f"({len(batch) / took if took else 0:.0f} events/s), oldest {lag:.1f}s old")
+        return len(batch)
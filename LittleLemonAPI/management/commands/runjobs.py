@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.jobs import run_batch
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs, polling for new ones until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_BATCH_SIZE,
+                            help="Number of jobs claimed at a time.")
+        parser.add_argument('--poll', type=float, default=settings.JOB_POLL_SECONDS,
+                            help="Seconds to wait when no job is due.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once no job is due instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            ran, failed = run_batch(options['batch_size'])
+            if ran:
+                self.stdout.write(f"Ran {ran} jobs, {failed} failed")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll'])
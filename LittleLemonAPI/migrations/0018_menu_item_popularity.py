@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0017_order_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='sales_30d',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='sales_7d',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['-popularity'], name='LittleLemon_popular_38c305_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', '-popularity'], name='LittleLemon_categor_3892dd_idx'),
+        ),
+        migrations.AddField(
+            model_name='menuitemsales',
+            name='menuitem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.menuitem'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitemsales',
+            index=models.Index(fields=['date'], name='LittleLemon_date_a92693_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='menuitemsales',
+            unique_together={('menuitem', 'date')},
+        ),
+    ]
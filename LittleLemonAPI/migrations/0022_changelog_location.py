@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def tag_order_changes(apps, schema_editor):
+    # Order changes were all logged in 'default' before, for the orders of the default location
+    if schema_editor.connection.alias != 'default':
+        return
+    ChangeLog = apps.get_model('LittleLemonAPI', 'ChangeLog')
+    ChangeLog.objects.using('default').filter(model='order').update(location=settings.DEFAULT_LOCATION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0021_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='location',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AlterField(
+            model_name='changelog',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(tag_order_changes, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # Create your models here.
 
@@ -19,33 +21,216 @@ class MenuItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    # Units sold over the last 7 and 30 days and the ranking score derived
+    # from them, maintained by popularity.py from MenuItemSales
+    sales_7d = models.PositiveIntegerField(default=0)
+    sales_30d = models.PositiveIntegerField(default=0)
+    popularity = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        """ Indexes for ?ordering=-popularity and the top sellers per category """
+        indexes = [
+            models.Index(fields=['-popularity']),
+            models.Index(fields=['category', '-popularity']),
+        ]
 
-class Cart(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+class MenuItemSales(models.Model):
+    """
+        Units of a menu item sold on one day, rolled up from OrderItem.
+        The rolling sales of MenuItem are summed from these rows.
+    """
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('menuitem', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+
+# Carts, orders and their archive are sharded by restaurant location (LittleLemon/sharding.py),
+# their users and menu items stay in 'default', so those foreign keys have no database constraint.
+class Cart(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, db_constraint=False)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    # Last time the line was added or changed, carts untouched for CART_EXPIRY_DAYS are purged
+    touched_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('menuitem', 'user')
 
 
 class Order(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, related_name="delivery_crew", null=True)
-    status = models.BooleanField(default=0, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    delivery_crew = models.ForeignKey(User, on_delete=models.SET_NULL, db_constraint=False, related_name="delivery_crew", null=True)
+    status = models.BooleanField(default=0)
     total = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     date = models.DateField(db_index=True, auto_now_add=True)
+    # Order number in the POS export for orders taken at the counter, see pos.py
+    pos_ref = models.CharField(max_length=64, null=True, blank=True, unique=True)
+
+    class Meta:
+        """ Composite indexes for the OrderList filters combined with a date range or date ordering """
+        indexes = [
+            models.Index(fields=['user', 'date']),
+            models.Index(fields=['delivery_crew', 'date']),
+            models.Index(fields=['status', 'date']),
+            models.Index(fields=['total']),
+        ]
 
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order')
-    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, db_constraint=False)
     quantity = models.SmallIntegerField()
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0)
 
     class Meta:
         """ This is a unique constraint on the order and menuitem fields """
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class ChangeLog(models.Model):
+    """
+        Append-only log of created, updated, deleted and archived rows.
+        The auto-incrementing id is the sync token handed out by the changes feed,
+        so a client only ever reads the rows logged after its last token. Ids are
+        taken in insert order, not commit order, so the feed only hands out rows
+        older than CHANGES_FEED_SETTLE_SECONDS.
+        Order changes are logged in the shard of the order with its location,
+        catalog changes in 'default' without one.
+        Rows are kept for CHANGES_FEED_RETENTION_DAYS.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    # Orders moved to the archive tables, still listed with ?archived=true
+    ARCHIVED = 'archived'
+    ACTION_CHOICES = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted'), (ARCHIVED, 'Archived')]
+
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False)
+    location = models.CharField(max_length=32, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """ Orders are only fed back to their owner, so the feed scans (model, id) and (user, id) ranges """
+        indexes = [
+            models.Index(fields=['model', 'id']),
+            models.Index(fields=['user', 'id']),
+        ]
+
+
+
+class Job(models.Model):
+    """
+        A unit of background work, run by the runjobs management command.
+        Finished jobs are deleted, failed ones are kept for inspection.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """ Workers claim the oldest due jobs of a status """
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+
+class ArchivedOrder(models.Model):
+    """
+        Delivered orders moved out of the Order table by the archive_orders command.
+        Ids are kept, and foreign keys carry no database constraint so that
+        archived rows never block deletes on the hot tables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    delivery_crew = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True)
+    status = models.BooleanField(default=True)
+    total = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    date = models.DateField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'date'])]
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='order')
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    quantity = models.SmallIntegerField()
+    price = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+
+
+
+class IdempotencyKey(models.Model):
+    """
+        The response to a write sent with an Idempotency-Key header, replayed for retries of it.
+        status_code is null while the first request is still being handled, which holds the
+        key from locked_at for IDEMPOTENCY_LOCK_SECONDS. Keys live in the location's shard,
+        expire after IDEMPOTENCY_KEY_TTL_HOURS and are deleted by prune_idempotency_keys.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    locked_at = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+
+class ProfileCapture(models.Model):
+    """
+        CPU profile and allocation snapshot of one profiled API request.
+        cpu_profile holds marshalled pstats data, loadable with pstats.Stats once downloaded.
+    """
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    peak_memory = models.PositiveBigIntegerField()
+    cpu_profile = models.BinaryField()
+    cpu_summary = models.TextField()
+    allocations = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class IngestCheckpoint(models.Model):
+    """
+        Records of a POS export already written by the ingest_pos command,
+        updated in the transaction of each batch so an interrupted run resumes after it.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class OutboxEvent(models.Model):
+    """
+        An order or menu event for downstream systems, written in the transaction
+        (and database) of the change and deleted once the relay_outbox command
+        has delivered it, see outbox.py.
+    """
+    aggregate = models.CharField(max_length=32)
+    aggregate_id = models.BigIntegerField()
+    event = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
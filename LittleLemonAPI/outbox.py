@@ -0,0 +1,112 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.utils.module_loading import import_string
+
+from LittleLemon.sharding import current_location, location_of, shard_aliases
+
+from .models import MenuItem, OutboxEvent
+
+"""
+    Transactional outbox of order and menu events for downstream systems
+    (kitchen display, accounting).
+
+    publish() adds events to the OutboxEvent table of the database the change is
+    written to, inside the change's transaction, so an event exists if and only if
+    its change was committed and the request never waits for a downstream system.
+    The relay_outbox command reads the events of each database in id order, in batches,
+    hands them to the OUTBOX_SINK and deletes them once the sink accepted the batch.
+    Delivery is at least once: a batch whose delete fails is sent again.
+    Events of one order or menu item are delivered in the order they were written
+    as long as one relay runs per database.
+"""
+
+ORDER_CREATED = 'order.created'
+ORDER_UPDATED = 'order.updated'
+MENUITEM_PRICE_CHANGED = 'menuitem.price_changed'
+
+
+def publish(model, using, events):
+    """
+        Queue events about rows of model in the database using, in one INSERT.
+        events is an iterable of (object_id, event, payload).
+    """
+    OutboxEvent.objects.using(using).bulk_create([
+        OutboxEvent(aggregate=model._meta.model_name, aggregate_id=object_id, event=event, payload=payload)
+        for object_id, event, payload in events
+    ])
+
+
+def order_created(order_id, user_id, total, status, date, items):
+    """ Payload of ORDER_CREATED, items are (menuitem_id, quantity, price) """
+    return {
+        'order_id': order_id,
+        'location': current_location(),
+        'user_id': user_id,
+        'total': total,
+        'status': bool(status),
+        'date': date,
+        'items': [
+            {'menuitem_id': menuitem_id, 'quantity': quantity, 'price': price}
+            for menuitem_id, quantity, price in items
+        ],
+    }
+
+
+def order_updated(order_id, changes):
+    """ Payload of ORDER_UPDATED, changes maps the changed fields to their new value """
+    return {'order_id': order_id, 'location': current_location(), 'changes': changes}
+
+
+def menuitem_price_changed(menuitem, old_price):
+    return {'menuitem_id': menuitem.id, 'title': menuitem.title, 'old_price': old_price, 'new_price': menuitem.price}
+
+
+def outbox_aliases():
+    """ Every database events are written to: the menu's and each shard's """
+    return list(dict.fromkeys([router.db_for_write(MenuItem), *shard_aliases()]))
+
+
+def message(event, alias):
+    """ What the sink receives. id is unique across databases, consumers can deduplicate on it """
+    return {
+        'id': f'{location_of(alias)}:{event.id}',
+        'event': event.event,
+        'aggregate': event.aggregate,
+        'aggregate_id': event.aggregate_id,
+        'created_at': event.created_at,
+        'payload': event.payload,
+    }
+
+
+def relay_batch(alias, sink, batch_size):
+    """
+        Deliver up to batch_size of the oldest events of a database and delete them.
+        The rows stay locked while the sink sends, so a second relay of the same
+        database waits instead of overtaking. Returns the delivered events.
+    """
+    with transaction.atomic(using=alias):
+        events = list(OutboxEvent.objects.using(alias).select_for_update().order_by('id')[:batch_size])
+        if events:
+            sink.send([message(event, alias) for event in events])
+            OutboxEvent.objects.using(alias).filter(pk__in=[event.pk for event in events]).delete()
+    return events
+
+
+def sink():
+    return import_string(settings.OUTBOX_SINK)(**settings.OUTBOX_SINK_OPTIONS)
+
+
+class NDJSONSink:
+    """ Append events to a file, one JSON object per line. For local development and replays """
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def send(self, messages):
+        self.file.write(''.join(json.dumps(m, cls=DjangoJSONEncoder) + '\n' for m in messages))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -1,4 +1,81 @@
+from django.core.paginator import Paginator, Page, PageNotAnInteger, EmptyPage
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.response import Response
+
+from .counts import approximate_count
+
+
+class ApproximatePage(Page):
+    """ A page that knows whether a next page exists from the rows it fetched, not from the count """
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+        Paginator whose count may be an estimate for large querysets.
+        With an estimated count, pages are fetched with one extra row to tell if another page
+        follows, and page numbers past the estimated end are allowed as long as they hold rows.
+    """
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            # Lists merged from several location shards count each shard exactly
+            return super().count
+        count, self.count_is_approximate = approximate_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        if not self.count or not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return ApproximatePage(rows[:self.per_page], number, self, has_more=len(rows) > self.per_page)
+
+
+class ApproximateCountPagination(pagination.PageNumberPagination):
+    """ Page number pagination that flags estimated counts with count_approximate """
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_approximate': self.page.paginator.count_is_approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
+
 
 class CategoryListPagination(pagination.PageNumberPagination):
     page_size = 5
@@ -7,7 +84,7 @@ class CategoryListPagination(pagination.PageNumberPagination):
     page_query_param = 'page'
 
 
-class MenuItemListPagination(pagination.PageNumberPagination):
+class MenuItemListPagination(ApproximateCountPagination):
     page_size = 5
     page_size_query_param = 'perpage'
     max_page_size = 50
@@ -19,8 +96,8 @@ class CartListPagination(pagination.PageNumberPagination):
     max_page_size = 50
     page_query_param = 'page'
 
-class OrderListPagination(pagination.PageNumberPagination):
+class OrderListPagination(ApproximateCountPagination):
     page_size = 5
     page_size_query_param = 'perpage'
     max_page_size = 50
-    page_query_param = 'page'
\ No newline at end of file
+    page_query_param = 'page'
@@ -0,0 +1,114 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.db.models import Sum, Q
+from django.utils import timezone
+
+from LittleLemon.sharding import shard_aliases
+
+from .changelog import record_changes
+from .models import ChangeLog, MenuItem, MenuItemSales, OrderItem
+
+"""
+    Precomputed menu item popularity.
+
+    Sales of every location are rolled up per menu item and day into MenuItemSales. The rolling
+    7 and 30 day sales of MenuItem, and the popularity score ranking the menu,
+    are summed from those rows, never from OrderItem. After checkout the
+    order_placed job recounts the days and items of the new orders, so a retried
+    job cannot count an order twice. The windows move every day, so the
+    refresh_popularity command recomputes every item once a day. Only items whose
+    numbers changed are written, and logged for the changes feed.
+"""
+
+# Weight of last week's sales in the score, on top of the 30 day sales
+WEEK_WEIGHT = 3
+
+
+def score(sales_7d, sales_30d):
+    return WEEK_WEIGHT * sales_7d + sales_30d
+
+
+def sales_by_day(**filters):
+    """ {(menuitem_id, date): units sold} over the order items of every location shard """
+    totals = Counter()
+    for alias in shard_aliases():
+        rows = (OrderItem.objects.using(alias).filter(**filters)
+                .values_list('menuitem_id', 'order__date')
+                .annotate(quantity=Sum('quantity')))
+        for menuitem_id, day, quantity in rows:
+            totals[(menuitem_id, day)] += quantity
+    return totals
+
+
+def roll_up(order_items):
+    """ Recount the MenuItemSales rows of the menu item and order date pairs in order_items """
+    pairs = set(order_items.values_list('menuitem_id', 'order__date'))
+    if not pairs:
+        return set()
+    menuitem_ids = {menuitem_id for menuitem_id, _ in pairs}
+    days = {day for _, day in pairs}
+    totals = sales_by_day(menuitem_id__in=menuitem_ids, order__date__in=days)
+    MenuItemSales.objects.bulk_create(
+        [MenuItemSales(menuitem_id=menuitem_id, date=day, quantity=quantity)
+         for (menuitem_id, day), quantity in totals.items() if (menuitem_id, day) in pairs],
+        update_conflicts=True, unique_fields=['menuitem', 'date'], update_fields=['quantity'],
+    )
+    return menuitem_ids
+
+
+def refresh_scores(menuitem_ids=None, batch_size=500):
+    """ Recompute the rolling sales and score of the given menu items, or of every item """
+    today = timezone.localdate()
+    rows = MenuItemSales.objects.filter(date__gt=today - timedelta(days=30))
+    if menuitem_ids is not None:
+        rows = rows.filter(menuitem_id__in=menuitem_ids)
+    totals = rows.values_list('menuitem_id').annotate(
+        sales_7d=Sum('quantity', filter=Q(date__gt=today - timedelta(days=7)), default=0),
+        sales_30d=Sum('quantity'),
+    )
+    items = [
+        MenuItem(id=menuitem_id, sales_7d=sales_7d, sales_30d=sales_30d, popularity=score(sales_7d, sales_30d))
+        for menuitem_id, sales_7d, sales_30d in totals
+    ]
+    current = {menuitem_id: numbers for menuitem_id, *numbers in MenuItem.objects.filter(
+        id__in=[item.id for item in items]).values_list('id', 'sales_7d', 'sales_30d', 'popularity')}
+    changed = [item for item in items
+               if item.id in current and current[item.id] != [item.sales_7d, item.sales_30d, item.popularity]]
+
+    # Items without sales in the window drop back to zero
+    idle = MenuItem.objects.exclude(id__in=[item.id for item in items]).filter(sales_30d__gt=0)
+    if menuitem_ids is not None:
+        idle = idle.filter(id__in=menuitem_ids)
+
+    using = router.db_for_write(MenuItem)
+    with transaction.atomic(using=using):
+        MenuItem.objects.bulk_update(changed, ['sales_7d', 'sales_30d', 'popularity'], batch_size=batch_size)
+        idle_ids = list(idle.values_list('id', flat=True))
+        MenuItem.objects.filter(id__in=idle_ids).update(sales_7d=0, sales_30d=0, popularity=0)
+        # bulk_update() and update() send no post_save, log the changes for the feed
+        record_changes(MenuItem, [(item.id, None) for item in changed] + [(pk, None) for pk in idle_ids],
+                       ChangeLog.UPDATED, using)
+    return len(items)
+
+
+def record_orders(order_ids):
+    """ Add orders placed at the current location to the rollup and rescore their menu items """
+    menuitem_ids = roll_up(OrderItem.objects.filter(order_id__in=order_ids))
+    if menuitem_ids:
+        refresh_scores(menuitem_ids)
+
+
+def rebuild(days, batch_size=500):
+    """ Recount the rollup of the last days from OrderItem, then rescore every item """
+    since = timezone.localdate() - timedelta(days=days)
+    totals = sales_by_day(order__date__gt=since)
+    with transaction.atomic():
+        MenuItemSales.objects.filter(date__gt=since).delete()
+        MenuItemSales.objects.bulk_create(
+            [MenuItemSales(menuitem_id=menuitem_id, date=day, quantity=quantity)
+             for (menuitem_id, day), quantity in totals.items()],
+            batch_size=batch_size,
+        )
+    return refresh_scores(batch_size=batch_size)
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from LittleLemon.sharding import current_shard
+
+from .changelog import record_changes
+from .outbox import publish, order_created, ORDER_CREATED
+from .models import ChangeLog, Order, OrderItem, IngestCheckpoint
+
+"""
+    Ingestion of orders exported by the POS.
+
+    An NDJSON export has one order per line:
+        {"pos_id": "A-1001", "user": "counter", "date": "2026-03-01", "status": true,
+         "items": [{"title": "Greek Salad", "quantity": 2, "unit_price": "12.50"}]}
+    A CSV export has one row per order item with the columns
+    pos_id,user,date,status,title,quantity,unit_price, the rows of an order next to each other.
+    user, status and unit_price are optional, the menu price is used when unit_price is empty.
+
+    Records are parsed and validated by worker processes (parse_chunk in pos_records.py),
+    which resolve menu items from a title map handed to them at start. The command writes the valid
+    records in batches (write_batch), each batch and its checkpoint in one transaction.
+    Orders are matched by pos_id, so a record already ingested is never written twice.
+"""
+
+
+def write_batch(records, source, position, default_user_id=None):
+    """
+        Write validated records to the current location and move the checkpoint of source
+        to position, in one transaction on its shard.
+        Returns (orders created, items created, [(pos_ref, error)] rejected, duplicates skipped, order ids).
+    """
+    usernames = {username for _, username, *_ in records if username}
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    with transaction.atomic(using=current_shard()):
+        refs = [ref for ref, *_ in records]
+        existing = set(Order.objects.filter(pos_ref__in=refs).values_list('pos_ref', flat=True))
+        rejected, duplicates, accepted = [], 0, {}
+        for ref, username, day, status, items, total in records:
+            user_id = users.get(username) if username else default_user_id
+            if ref in existing or ref in accepted:
+                duplicates += 1
+            elif user_id is None:
+                rejected.append((ref, f"unknown user {username!r}" if username else "no user"))
+            else:
+                accepted[ref] = (user_id, day, status, items, total)
+
+        Order.objects.bulk_create([
+            Order(pos_ref=ref, user_id=user_id, status=status, total=total)
+            for ref, (user_id, day, status, items, total) in accepted.items()
+        ])
+        # Not every backend returns the ids of a bulk insert, so read them back by pos_ref
+        ids = dict(Order.objects.filter(pos_ref__in=accepted).values_list('pos_ref', 'id'))
+
+        # auto_now_add stamps today on insert, set the dates of the export with one UPDATE per day
+        by_day = {}
+        for ref, (user_id, day, *_) in accepted.items():
+            by_day.setdefault(day, []).append(ids[ref])
+        for day, order_ids in by_day.items():
+            Order.objects.filter(id__in=order_ids).update(date=day)
+
+        order_items = [
+            OrderItem(order_id=ids[ref], menuitem_id=menuitem_id, quantity=quantity, price=price)
+            for ref, (user_id, day, status, items, total) in accepted.items()
+            for menuitem_id, quantity, price in items
+        ]
+        OrderItem.objects.bulk_create(order_items)
+        record_changes(Order, [(ids[ref], user_id) for ref, (user_id, *_) in accepted.items()],
+                       ChangeLog.CREATED, current_shard())
+        publish(Order, current_shard(), [
+            (ids[ref], ORDER_CREATED, order_created(ids[ref], user_id, total, status, day, items))
+            for ref, (user_id, day, status, items, total) in accepted.items()
+        ])
+
+        IngestCheckpoint.objects.update_or_create(source=source, defaults={'position': position})
+
+    return len(accepted), len(order_items), rejected, duplicates, list(ids.values())
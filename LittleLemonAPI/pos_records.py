@@ -0,0 +1,103 @@
+import csv
+import itertools
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+"""
+    Parsing and validation of POS export records, run in the worker processes of ingest_pos.
+
+    Nothing here imports Django or the app's models, so the workers start the same way
+    under every multiprocessing start method (fork, spawn, forkserver). Menu items are
+    resolved from the title map handed to each worker by init_worker.
+    See LittleLemonAPI/pos.py for the export formats and the writing of the records.
+"""
+
+# Largest value of the DecimalField(max_digits=6, decimal_places=2) prices
+MAX_PRICE = Decimal('9999.99')
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(path, export_format, skip=0):
+    """ Yield (position, raw record) for each order of an export, after the first skip ones """
+    with open(path, newline='') as export:
+        if export_format == 'ndjson':
+            records = (line for line in export if line.strip())
+        else:
+            rows = csv.DictReader(export)
+            records = (list(group) for _, group in itertools.groupby(rows, key=lambda row: row['pos_id']))
+        for position, raw in enumerate(records, 1):
+            if position > skip:
+                yield position, raw
+
+
+def from_csv(rows):
+    first = rows[0]
+    return {
+        'pos_id': first['pos_id'],
+        'user': first.get('user'),
+        'date': first['date'],
+        'status': first.get('status') or 'true',
+        'items': [
+            {'title': row['title'], 'quantity': row['quantity'], 'unit_price': row.get('unit_price')}
+            for row in rows
+        ],
+    }
+
+
+def parse_status(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'delivered')
+    return bool(value)
+
+
+# Menu title -> (id, price), set in each worker process by init_worker
+_menu = {}
+
+
+def init_worker(menu):
+    global _menu
+    _menu = menu
+
+
+def validate(data):
+    """ A record as (pos_ref, username, date, status, [(menuitem_id, quantity, price)], total) """
+    ref = str(data['pos_id']).strip()
+    if not ref or len(ref) > 64:
+        raise InvalidRecord("pos_id must be 1 to 64 characters")
+    day = date.fromisoformat(data['date'])
+
+    lines = {}
+    for item in data['items']:
+        if item['title'] not in _menu:
+            raise InvalidRecord(f"unknown menu item {item['title']!r}")
+        menuitem_id, menu_price = _menu[item['title']]
+        quantity = int(item['quantity'])
+        if quantity <= 0:
+            raise InvalidRecord(f"quantity of {item['title']!r} must be positive")
+        unit_price = Decimal(str(item['unit_price'])) if item.get('unit_price') not in (None, '') else menu_price
+        previous_quantity, previous_price = lines.get(menuitem_id, (0, Decimal('0.00')))
+        lines[menuitem_id] = (previous_quantity + quantity, previous_price + unit_price * quantity)
+    if not lines:
+        raise InvalidRecord("order has no items")
+
+    items = [(menuitem_id, quantity, price) for menuitem_id, (quantity, price) in lines.items()]
+    total = sum(price for _, _, price in items)
+    if total > MAX_PRICE or any(quantity > 32767 for _, quantity, _ in items):
+        raise InvalidRecord("order total or quantity out of range")
+    return ref, data.get('user') or None, day, parse_status(data.get('status', True)), items, total
+
+
+def parse_chunk(chunk, export_format):
+    """ Runs in a worker process: [(position, record or None, error or None)] for a chunk of raw records """
+    results = []
+    for position, raw in chunk:
+        try:
+            data = json.loads(raw) if export_format == 'ndjson' else from_csv(raw)
+            results.append((position, validate(data), None))
+        except (InvalidRecord, KeyError, ValueError, TypeError, InvalidOperation) as error:
+            results.append((position, None, f"{type(error).__name__}: {error}"))
+    return results
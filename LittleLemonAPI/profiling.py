@@ -0,0 +1,128 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from .models import ProfileCapture
+
+"""
+    Opt-in profiling of API views.
+
+    A request is profiled when a staff user sends the X-Profile header, or when it is
+    picked by PROFILE_SAMPLE_RATE. The view's handler runs under cProfile and tracemalloc
+    and the result is stored as a ProfileCapture, downloadable from /api/profiles/.
+    Unprofiled requests only pay for a header lookup and a random draw.
+    A capture that fails to be stored is logged, the response is sent without X-Profile-Id.
+    A handler that raises is captured too, with status 500.
+"""
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+
+# tracemalloc is process wide, so one request is profiled at a time per process
+_lock = threading.Lock()
+
+
+def should_profile(request):
+    if request.headers.get(HEADER) and request.user.is_staff:
+        return True
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class Profiling:
+    def __init__(self):
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self, request, status_code):
+        self.profiler.disable()
+        duration = time.perf_counter() - self.started
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+
+        stats = pstats.Stats(self.profiler)
+        summary = io.StringIO()
+        pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+        top = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')[:40]
+
+        capture = ProfileCapture.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:255],
+            user=request.user if request.user.is_authenticated else None,
+            status_code=status_code,
+            duration_ms=duration * 1000,
+            peak_memory=peak,
+            cpu_profile=marshal.dumps(stats.stats),
+            cpu_summary=summary.getvalue(),
+            allocations='\n'.join(str(stat) for stat in top),
+        )
+        prune_captures()
+        return capture
+
+
+def prune_captures():
+    """ Keep the PROFILE_MAX_CAPTURES most recent captures """
+    oldest_kept = (ProfileCapture.objects.order_by('-id')
+                   .values_list('id', flat=True)[settings.PROFILE_MAX_CAPTURES - 1:settings.PROFILE_MAX_CAPTURES])
+    if oldest_kept:
+        ProfileCapture.objects.filter(id__lt=oldest_kept[0]).delete()
+
+
+class ProfiledViewMixin:
+    """ Profile the handler of sampled or requested calls of a DRF view """
+    profiling = None
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication, so the staff check sees the real user
+        super().initial(request, *args, **kwargs)
+        if should_profile(request) and _lock.acquire(blocking=False):
+            try:
+                self.profiling = Profiling()
+            except Exception:
+                _lock.release()
+                raise
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # DRF skips finalize_response when the handler raises an uncaught exception
+            if self.profiling is not None:
+                self.stop_profiling(self.request, 500)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.profiling is not None:
+            capture = self.stop_profiling(request, response.status_code)
+            if capture is not None:
+                response['X-Profile-Id'] = str(capture.id)
+        return response
+
+    def stop_profiling(self, request, status_code):
+        """ Store the capture and free the profiler for the next request, returns None when storing failed """
+        try:
+            return self.profiling.stop(request, status_code)
+        except Exception:
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
+            return None
+        finally:
+            self.profiling = None
+            _lock.release()
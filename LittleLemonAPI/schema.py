@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.metadata import SimpleMetadata
+from rest_framework.request import Request
+from rest_framework.schemas.generators import EndpointEnumerator
+from rest_framework.schemas.openapi import AutoSchema, SchemaGenerator
+
+"""
+    OpenAPI schema of the API, built once instead of on every request.
+
+    The generate_schema command writes the document to SCHEMA_FILE. A process that
+    finds no file builds it on first use (or in the warm-up, see warmup.py) and keeps
+    it in memory. The document is served by openapi_schema in views.py.
+
+    OPTIONS requests get DRF's metadata through CachedMetadata, which describes each
+    serializer once per process instead of on every request.
+"""
+
+# Apps whose views are part of the schema: the API, user accounts and JWT tokens
+SCHEMA_APPS = ('LittleLemonAPI', 'djoser', 'rest_framework_simplejwt')
+
+
+class ApiAutoSchema(AutoSchema):
+    """ AutoSchema that also documents the django-filter query parameters, which django-filter no longer does """
+    def get_serializer(self, path, method):
+        # Views like the change feed build their responses without a serializer_class
+        try:
+            return super().get_serializer(path, method)
+        except AssertionError:
+            return None
+
+    def get_operation_id(self, path, method):
+        operation_id = super().get_operation_id(path, method)
+        # A viewset action serving several methods, like djoser's users/me/, would get
+        # the same id for each: name them after the method instead
+        action_map = getattr(self.view, 'action_map', None) or {}
+        action = action_map.get(method.lower())
+        if list(action_map.values()).count(action) > 1:
+            operation_id = self.method_mapping[method.lower()] + operation_id[0].upper() + operation_id[1:]
+        return operation_id
+
+    def get_filter_parameters(self, path, method):
+        if not self.allows_filters(path, method):
+            return []
+        parameters = []
+        for backend in self.view.filter_backends:
+            if issubclass(backend, DjangoFilterBackend):
+                parameters += self.get_filterset_parameters()
+            elif hasattr(backend, 'get_schema_operation_parameters'):
+                parameters += backend().get_schema_operation_parameters(self.view)
+        return parameters
+
+    def get_filterset_parameters(self):
+        filterset_class = getattr(self.view, 'filterset_class', None)
+        queryset = getattr(self.view, 'queryset', None)
+        if filterset_class is None and queryset is not None:
+            filterset_class = DjangoFilterBackend().get_filterset_class(self.view, queryset)
+        if filterset_class is None:
+            return []
+        return [
+            {
+                'name': name,
+                'required': field.extra['required'],
+                'in': 'query',
+                'description': str(field.label or ''),
+                'schema': {'type': 'string'},
+            }
+            for name, field in filterset_class.base_filters.items()
+        ]
+
+
+class ApiEndpointEnumerator(EndpointEnumerator):
+    def should_include_endpoint(self, path, callback):
+        if not super().should_include_endpoint(path, callback):
+            return False
+        return callback.cls.__module__.split('.')[0] in SCHEMA_APPS
+
+
+class ApiSchemaGenerator(SchemaGenerator):
+    endpoint_inspector_cls = ApiEndpointEnumerator
+
+    def create_view(self, callback, method, request=None):
+        # Views pick serializers and filters from their request, so describe them for an anonymous one
+        if request is None:
+            request = Request(RequestFactory().get('/'))
+            request.user = AnonymousUser()
+        return super().create_view(callback, method, request)
+
+    def has_view_permissions(self, path, method, view):
+        # The schema documents every endpoint, not the ones the placeholder user may call
+        return True
+
+
+def generate():
+    """ The schema as a dict, built from the URL patterns and views """
+    generator = ApiSchemaGenerator(title='Little Lemon API', version='1.0.0',
+                                   description='Menu, cart, order and user account API of Little Lemon.')
+    return generator.get_schema(request=None, public=True)
+
+
+class Document:
+    """ The serialized schema, compressed once """
+    def __init__(self, content):
+        self.content = content
+        self.gzip = gzip.compress(content)
+        self.etag = '"%s"' % hashlib.md5(content).hexdigest()
+
+
+_document = None
+_lock = threading.Lock()
+
+
+def document():
+    """ The schema document of this process, read from SCHEMA_FILE or generated once """
+    global _document
+    if _document is None:
+        with _lock:
+            if _document is None:
+                try:
+                    content = Path(settings.SCHEMA_FILE).read_bytes()
+                except FileNotFoundError:
+                    content = json.dumps(generate()).encode()
+                _document = Document(content)
+    return _document
+
+
+class CachedMetadata(SimpleMetadata):
+    """
+        DRF's OPTIONS metadata, with the fields of each serializer described once per process.
+        Which actions are listed is still decided per request by the user's permissions.
+        Actions describe writes, and serializers only narrow their fields (?fields=, ?expand=)
+        for reads, so the description of a serializer class never changes.
+    """
+    serializer_info = {}
+
+    def get_serializer_info(self, serializer):
+        key = type(serializer)
+        if key not in self.serializer_info:
+            self.serializer_info[key] = super().get_serializer_info(serializer)
+        return self.serializer_info[key]
@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, ProfileCapture
 from django.contrib.auth.models import User
 from decimal import Decimal
 
+from LittleLemon.sharding import location_of
+
 """
     Serializers are used to convert complex data types, like querysets and model instances, into native Python datatypes.
     They also handle deserialization, allowing parsed data to be converted back into complex types.
@@ -13,7 +15,41 @@ from decimal import Decimal
     
 """
 
-class CategorySerializer (serializers.ModelSerializer):
+def requested(request, param):
+    """ The comma separated names passed in ?fields= or ?expand= """
+    return {name for name in request.query_params.get(param, '').split(',') if name}
+
+
+def renders(request, field):
+    """ Whether a field is part of the response for ?fields= """
+    fields = requested(request, 'fields')
+    return not fields or field in fields
+
+
+class DynamicFieldsMixin:
+    """
+        Limit the response to the fields listed in ?fields= and render the relations
+        listed in ?expand= with the serializers in expandable_fields.
+        Only reads are affected, writes always validate every field.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+
+        for name in requested(request, 'expand') & self.expandable_fields.keys():
+            self.fields[name] = self.expandable_fields[name]()
+
+        fields = requested(request, 'fields')
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class CategorySerializer (DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         """ This is a serializer for the Category model. It is used to convert complex data types, like querysets and model instances, into native Python datatypes. """
         model = Category
@@ -25,17 +61,22 @@ class CategorySerializer (serializers.ModelSerializer):
                 raise serializers.ValidationError("A category with this name already exists.")
             return value
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all()
     )
-    # category = CategorySerializer(read_only=True)
+    # ?expand=category nests the category, the view joins it only then
+    expandable_fields = {
+        'category': lambda: CategorySerializer(read_only=True),
+    }
+
     class Meta:
         model = MenuItem
-        fields = ['id', 'title', 'price', 'category', 'featured']
+        fields = ['id', 'title', 'price', 'category', 'featured', 'sales_7d', 'sales_30d', 'popularity']
+        read_only_fields = ['sales_7d', 'sales_30d', 'popularity']
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         default=serializers.CurrentUserDefault()
@@ -56,21 +97,75 @@ class CartSerializer(serializers.ModelSerializer):
         }
 
 
+class CartSummarySerializer(serializers.Serializer):
+    """ The summary of a cart, rendered with the total as a string like every other price """
+    lines = serializers.IntegerField()
+    items = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['order', 'menuitem', 'quantity', 'price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderItemDetailSerializer(serializers.ModelSerializer):
+    menuitem = MenuItemSerializer(read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['order', 'menuitem', 'quantity', 'price']
+
+
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     orderitem = OrderItemSerializer(many=True, read_only=True, source='order')
+    # The restaurant location whose database holds the order, ids are only unique per location
+    location = serializers.SerializerMethodField()
+    # ?expand=orderitem renders each item with its menu item instead of its id
+    expandable_fields = {
+        'orderitem': lambda: OrderItemDetailSerializer(many=True, read_only=True, source='order'),
+    }
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'delivery_crew',
+        fields = ['id', 'location', 'user', 'delivery_crew',
                   'status', 'date', 'total', 'orderitem']
 
+    def get_location(self, order):
+        return location_of(order._state.db)
+
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['order', 'menuitem', 'quantity', 'price']
+
+
+class ArchivedOrderItemDetailSerializer(serializers.ModelSerializer):
+    menuitem = MenuItemSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['order', 'menuitem', 'quantity', 'price']
+
+
+class ArchivedOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """ Archived orders render exactly like live ones """
+    orderitem = ArchivedOrderItemSerializer(many=True, read_only=True, source='order')
+    location = serializers.SerializerMethodField()
+    expandable_fields = {
+        'orderitem': lambda: ArchivedOrderItemDetailSerializer(many=True, read_only=True, source='order'),
+    }
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'location', 'user', 'delivery_crew',
+                  'status', 'date', 'total', 'orderitem']
+
+    def get_location(self, order):
+        return location_of(order._state.db)
+
 class OrderUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
@@ -84,4 +179,18 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id','username','email']
\ No newline at end of file
+        fields = ['id','username','email']
+
+
+class ProfileCaptureSerializer(serializers.ModelSerializer):
+    """ The summaries are only rendered for a single capture """
+    class Meta:
+        model = ProfileCapture
+        fields = ['id', 'method', 'path', 'user', 'status_code', 'duration_ms',
+                  'peak_memory', 'created_at', 'cpu_summary', 'allocations']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('detail'):
+            self.fields.pop('cpu_summary')
+            self.fields.pop('allocations')
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, MenuItem, Order, ChangeLog, Cart
+from .changelog import record_change, deleted_action
+from .carts import invalidate_summaries
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Order)
+def log_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # Fixture loading, the rows are not new to clients
+        return
+    record_change(instance, ChangeLog.CREATED if created else ChangeLog.UPDATED)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Order)
+def log_delete(sender, instance, **kwargs):
+    record_change(instance, deleted_action())
+
+
+@receiver(post_save, sender=Cart)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    # Deletes invalidate explicitly, a post_delete receiver would stop
+    # QuerySet.delete() on carts from deleting without loading the rows
+    invalidate_summaries([instance.user_id], instance._state.db)
@@ -0,0 +1,53 @@
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+
+from LittleLemon.sharding import using_location
+
+from .jobs import job
+from .housekeeping import purge_expired_carts, prune_expired_tokens, prune_idempotency_keys, prune_change_log
+from .popularity import record_orders, refresh_scores
+
+"""
+    Background jobs of the LittleLemonAPI app, see jobs.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@job('order_placed', batched=True)
+def order_placed(payloads):
+    """ Follow-up work after checkout, kept off the request path """
+    by_location = defaultdict(list)
+    for payload in payloads:
+        by_location[payload.get('location', settings.DEFAULT_LOCATION)].append(payload['order_id'])
+    for location, order_ids in by_location.items():
+        with using_location(location):
+            record_orders(order_ids)
+        logger.info("Processed %d orders placed at %s: %s", len(order_ids), location, order_ids)
+
+
+@job('refresh_popularity')
+def refresh_popularity_job():
+    refresh_scores()
+
+
+@job('purge_expired_carts')
+def purge_expired_carts_job(expiry_days=None):
+    purge_expired_carts(expiry_days or settings.CART_EXPIRY_DAYS, settings.PURGE_BATCH_SIZE)
+
+
+@job('prune_expired_tokens')
+def prune_expired_tokens_job():
+    prune_expired_tokens(settings.PURGE_BATCH_SIZE)
+
+
+@job('prune_change_log')
+def prune_change_log_job():
+    prune_change_log(settings.CHANGES_FEED_RETENTION_DAYS, settings.PURGE_BATCH_SIZE)
+
+
+@job('prune_idempotency_keys')
+def prune_idempotency_keys_job():
+    prune_idempotency_keys(settings.IDEMPOTENCY_KEY_TTL_HOURS, settings.PURGE_BATCH_SIZE)
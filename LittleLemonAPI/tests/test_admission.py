@@ -0,0 +1,162 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from LittleLemon.admission import AdmissionController, classify
+
+CLASSES = ['checkout', 'orders', 'browsing']
+CHECKOUT, ORDERS, BROWSING = range(3)
+TARGET = 0.1
+
+
+def busy_controller(limit=1, max_wait=0.02):
+    """ A controller whose slots are all taken """
+    admission = AdmissionController(limit, CLASSES, TARGET, max_wait)
+    for _ in range(limit):
+        assert admission.admit('checkout')
+    return admission
+
+
+class ClassifyTests(SimpleTestCase):
+    def test_first_matching_rule_wins(self):
+        self.assertEqual(classify('POST', '/api/orders/'), 'checkout')
+        self.assertEqual(classify('GET', '/api/orders/'), 'orders')
+        self.assertEqual(classify('GET', '/api/orders/3/'), 'orders')
+        self.assertEqual(classify('DELETE', '/api/cart/'), 'checkout')
+        self.assertEqual(classify('GET', '/api/menu/top/'), 'browsing')
+        self.assertEqual(classify('GET', '/menu/'), 'browsing')
+
+    def test_unmatched_requests_get_the_default_class(self):
+        self.assertEqual(classify('POST', '/menu/'), 'orders')
+        self.assertEqual(classify('GET', '/api/users/me/'), 'orders')
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def test_admits_up_to_the_limit(self):
+        admission = AdmissionController(2, CLASSES, TARGET, 0.02)
+
+        self.assertTrue(admission.admit('browsing'))
+        self.assertTrue(admission.admit('orders'))
+        self.assertFalse(admission.admit('checkout'))
+
+        admission.release()
+        self.assertTrue(admission.admit('checkout'))
+        self.assertEqual(admission.active, 2)
+
+    def test_no_class_is_shed_while_a_slot_is_free(self):
+        admission = AdmissionController(2, CLASSES, TARGET, 0.02)
+        admission.queue_delay = 10 * TARGET
+
+        self.assertTrue(admission.admit('browsing'))
+
+    def test_sheds_the_lowest_class_first(self):
+        admission = busy_controller()
+
+        admission.queue_delay = 1.5 * TARGET
+        self.assertEqual([admission.sheds(p) for p in range(3)], [False, False, True])
+        admission.queue_delay = 2.5 * TARGET
+        self.assertEqual([admission.sheds(p) for p in range(3)], [False, True, True])
+        admission.queue_delay = 100 * TARGET
+        self.assertEqual([admission.sheds(p) for p in range(3)], [False, True, True])
+
+    def test_shed_requests_return_at_once_and_the_rest_time_out(self):
+        admission = busy_controller(max_wait=0.05)
+        admission.queue_delay = 1.5 * TARGET
+
+        started = time.monotonic()
+        self.assertFalse(admission.admit('browsing'))
+        self.assertLess(time.monotonic() - started, 0.05)
+
+        started = time.monotonic()
+        self.assertFalse(admission.admit('orders'))
+        self.assertFalse(admission.admit('checkout'))
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+        counters = {name: stats for name, stats in admission.snapshot()['classes'].items()}
+        self.assertEqual((counters['browsing']['shed'], counters['browsing']['timed_out']), (1, 0))
+        self.assertEqual((counters['orders']['shed'], counters['orders']['timed_out']), (0, 1))
+        self.assertEqual((counters['checkout']['admitted'], counters['checkout']['timed_out']), (1, 1))
+
+    def test_higher_classes_are_admitted_first(self):
+        admission = busy_controller(max_wait=2)
+        admitted = []
+
+        def request(name):
+            if admission.admit(name):
+                admitted.append(name)
+
+        browsing = threading.Thread(target=request, args=('browsing',))
+        browsing.start()
+        self.wait_for(lambda: admission.waiting[BROWSING] == 1)
+        checkout = threading.Thread(target=request, args=('checkout',))
+        checkout.start()
+        self.wait_for(lambda: admission.waiting[CHECKOUT] == 1)
+
+        admission.release()
+        checkout.join(1)
+        self.assertEqual(admitted, ['checkout'])
+        admission.release()
+        browsing.join(1)
+        self.assertEqual(admitted, ['checkout', 'browsing'])
+
+    def test_snapshot(self):
+        admission = AdmissionController(2, CLASSES, TARGET, 0.02)
+        admission.admit('checkout')
+        admission.admit('browsing')
+        admission.queue_delay = 1.5 * TARGET
+
+        snapshot = admission.snapshot()
+
+        self.assertEqual((snapshot['limit'], snapshot['active']), (2, 2))
+        self.assertEqual(snapshot['queue_delay_ms'], 150.0)
+        self.assertEqual(snapshot['latency_target_ms'], 100.0)
+        self.assertEqual(snapshot['classes']['browsing'],
+                         {'priority': 2, 'waiting': 0, 'shedding': True, 'admitted': 1, 'shed': 0, 'timed_out': 0})
+        self.assertEqual(snapshot['classes']['checkout']['admitted'], 1)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 1
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+
+class AdmissionMiddlewareTests(TestCase):
+    def test_shed_request_gets_503_with_retry_after(self):
+        admission = busy_controller()
+        admission.queue_delay = 1.5 * TARGET
+
+        with mock.patch('LittleLemon.middleware.controller', return_value=admission):
+            response = self.client.get('/api/menu/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(admission.counters['browsing']['shed'], 1)
+
+    def test_admitted_request_releases_its_slot(self):
+        admission = AdmissionController(1, CLASSES, TARGET, 0.02)
+
+        with mock.patch('LittleLemon.middleware.controller', return_value=admission):
+            self.assertEqual(self.client.get('/api/menu/').status_code, 200)
+
+        self.assertEqual(admission.active, 0)
+        self.assertEqual(admission.counters['browsing']['admitted'], 1)
+
+    def test_stats_show_the_counters_of_the_worker(self):
+        admission = AdmissionController(1, CLASSES, TARGET, 0.02)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+
+        with mock.patch('LittleLemon.middleware.controller', return_value=admission), \
+                mock.patch('LittleLemonAPI.views.controller', return_value=admission):
+            client.get('/api/menu/')
+            data = client.get('/api/admission/').data
+
+        self.assertEqual(data['classes']['browsing']['admitted'], 1)
+        # The stats request itself holds a slot
+        self.assertEqual(data['active'], 1)
+        self.assertEqual(data['classes']['orders']['admitted'], 1)
@@ -0,0 +1,66 @@
+import json
+import warnings
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import Cart, Category, MenuItem
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('joe')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+        self.pie = MenuItem.objects.create(title='Pie', price=Decimal('4.50'), featured=False, category=category)
+
+    def add(self, menuitem, quantity):
+        # The summary is dropped once the cart change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/cart/', {'menuitem_id': menuitem.id, 'quantity': quantity}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def summary(self):
+        return json.loads(self.client.get('/api/cart/summary/').content)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.summary(), {'lines': 0, 'items': 0, 'total': '0.00'})
+
+    def test_total_renders_as_a_string_on_both_endpoints(self):
+        self.add(self.soup, 2)
+        self.add(self.pie, 2)
+
+        expected = {'lines': 2, 'items': 4, 'total': '15.00'}
+        self.assertEqual(self.summary(), expected)
+        self.assertEqual(json.loads(self.client.get('/api/cart/').content)['summary'], expected)
+
+    def test_summary_follows_added_and_removed_lines(self):
+        self.add(self.soup, 1)
+        self.assertEqual(self.summary()['total'], '3.00')
+
+        self.add(self.soup, 1)
+        self.assertEqual(self.summary(), {'lines': 1, 'items': 2, 'total': '6.00'})
+
+        self.add(self.pie, 1)
+        self.assertEqual(self.summary(), {'lines': 2, 'items': 3, 'total': '10.50'})
+
+        line = Cart.objects.get(menuitem=self.soup)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/cart/{line.id}/').status_code, 204)
+        self.assertEqual(self.summary(), {'lines': 1, 'items': 1, 'total': '4.50'})
+
+    def test_cart_list_is_ordered(self):
+        self.add(self.pie, 1)
+        self.add(self.soup, 1)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = self.client.get('/api/cart/')
+
+        self.assertEqual([line['menuitem'] for line in response.data['results']], [self.pie.id, self.soup.id])
@@ -0,0 +1,169 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.archive import archive_batch
+from LittleLemonAPI.housekeeping import prune_change_log
+from LittleLemonAPI.models import Category, ChangeLog, MenuItem, MenuItemSales, Order
+from LittleLemonAPI.popularity import refresh_scores
+
+
+@override_settings(CHANGES_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    databases = {'default', 'downtown'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('joe')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False,
+                                            category=self.category)
+
+    def token(self, **headers):
+        return self.client.get('/api/changes/', **headers).data['token']
+
+    def changes(self, since, **headers):
+        response = self.client.get('/api/changes/', {'since': since}, **headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def checkout(self, location='main'):
+        self.client.post('/api/cart/', {'menuitem_id': self.soup.id, 'quantity': 1}, format='json',
+                         HTTP_X_LOCATION=location)
+        return self.client.post('/api/orders/', HTTP_X_LOCATION=location).data['order_id']
+
+    def test_checkout_logs_one_created_row(self):
+        order_id = self.checkout()
+
+        self.assertEqual(list(ChangeLog.objects.filter(model='order', object_id=order_id)
+                              .values_list('action', flat=True)), [ChangeLog.CREATED])
+        self.assertEqual(Order.objects.get(pk=order_id).total, Decimal('3.00'))
+
+    def test_returns_the_changes_after_the_token(self):
+        token = self.token()
+        self.soup.price = Decimal('4.00')
+        self.soup.save()
+        pie = MenuItem.objects.create(title='Pie', price=Decimal('5.00'), featured=False, category=self.category)
+        pie_id = pie.id
+        pie.delete()
+        order_id = self.checkout()
+
+        data = self.changes(token)
+
+        self.assertEqual([item['price'] for item in data['menuitems']['changed']], ['4.00'])
+        self.assertEqual(data['menuitems']['deleted'], [pie_id])
+        self.assertEqual([order['id'] for order in data['orders']['changed']], [order_id])
+        self.assertFalse(data['has_more'])
+
+        data = self.changes(data['token'])
+        self.assertEqual(data['menuitems'], {'changed': [], 'deleted': []})
+        self.assertEqual(data['orders'], {'changed': [], 'deleted': [], 'archived': []})
+
+    @override_settings(CHANGES_FEED_SETTLE_SECONDS=60)
+    def test_holds_back_changes_until_they_settle(self):
+        token = '0.0'
+        data = self.changes(token)
+
+        self.assertEqual(data['token'], token)
+        self.assertEqual(data['menuitems']['changed'], [])
+        self.assertEqual(self.token(), token)
+
+    @override_settings(CHANGES_FEED_LIMIT=1)
+    def test_pages_with_has_more(self):
+        token = self.token()
+        Category.objects.create(title='Desserts', slug='desserts')
+        Category.objects.create(title='Drinks', slug='drinks')
+
+        first = self.changes(token)
+        second = self.changes(first['token'])
+
+        self.assertTrue(first['has_more'])
+        self.assertEqual([c['title'] for c in first['categories']['changed'] + second['categories']['changed']],
+                         ['Desserts', 'Drinks'])
+
+    def test_accepts_a_single_id_token(self):
+        token = self.token().split('.')[0]
+        self.soup.save()
+
+        self.assertEqual(len(self.changes(token)['menuitems']['changed']), 1)
+
+    def test_orders_are_fed_per_location(self):
+        main_token = self.token()
+        downtown_token = self.token(HTTP_X_LOCATION='downtown')
+        order_id = self.checkout('downtown')
+
+        self.assertEqual(self.changes(main_token)['orders']['changed'], [])
+        data = self.changes(downtown_token, HTTP_X_LOCATION='downtown')
+        self.assertEqual([order['id'] for order in data['orders']['changed']], [order_id])
+        self.assertEqual(ChangeLog.objects.using('downtown').get(model='order', action='created').location,
+                         'downtown')
+
+    def test_archived_orders_are_not_deletions(self):
+        order_id = self.checkout()
+        token = self.token()
+        Order.objects.filter(pk=order_id).update(status=True, date=date(2020, 1, 1))
+
+        self.assertEqual(archive_batch(30, 10), 1)
+
+        data = self.changes(token)
+        self.assertEqual(data['orders'], {'changed': [], 'deleted': [], 'archived': [order_id]})
+
+    def test_logs_popularity_updates(self):
+        MenuItemSales.objects.create(menuitem=self.soup, date=timezone.localdate(), quantity=2)
+        token = self.token()
+
+        refresh_scores()
+        data = self.changes(token)
+        self.assertEqual([(item['id'], item['sales_7d']) for item in data['menuitems']['changed']],
+                         [(self.soup.id, 2)])
+
+        # Unchanged numbers are not written or logged again
+        refresh_scores()
+        self.assertEqual(self.changes(data['token'])['menuitems']['changed'], [])
+
+    def test_pruned_tokens_are_gone(self):
+        token = self.token()
+        Category.objects.create(title='Desserts', slug='desserts')
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=40))
+        Category.objects.create(title='Drinks', slug='drinks')
+
+        self.assertEqual(prune_change_log(30, 100)[0], 3)
+
+        self.assertEqual(self.client.get('/api/changes/', {'since': token}).status_code, 410)
+        self.assertEqual([c['title'] for c in self.changes(self.token())['categories']['changed']], [])
+
+
+@override_settings(CHANGES_FEED_SETTLE_SECONDS=0)
+class ChangeFeedReplicaTests(TransactionTestCase):
+    """ The replica mirrors 'default' on another connection, so the rows are committed """
+    databases = {'default', 'downtown', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('joe'))
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+
+    @override_settings(DATABASE_REPLICAS=['replica', 'replica'])
+    def test_reads_the_catalog_from_one_replica_per_call(self):
+        token = self.client.get('/api/changes/').data['token']
+        self.soup.price = Decimal('4.00')
+        self.soup.save()
+
+        with mock.patch('LittleLemon.routers.random.choice', wraps=random.choice) as choice:
+            data = self.client.get('/api/changes/', {'since': token}).data
+
+        # A second pick could land on a replica that is further behind than the token
+        self.assertEqual(choice.call_count, 1)
+        self.assertEqual([item['price'] for item in data['menuitems']['changed']], ['4.00'])
+
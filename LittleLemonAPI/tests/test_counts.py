@@ -0,0 +1,81 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.counts import approximate_count, estimated_count
+from LittleLemonAPI.models import Category, MenuItem
+
+# SQLite keeps no table statistics, this stands in for them
+STATISTICS = mock.patch.dict('LittleLemonAPI.counts.TABLE_STATISTICS', {'sqlite': "SELECT 40 WHERE %s <> ''"})
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=10)
+class ApproximateCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(title='Mains', slug='mains')
+        self.add_items(12)
+
+    def add_items(self, count):
+        start = MenuItem.objects.count()
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Item {number:02}', price=Decimal('1.00'), featured=False, category=self.category)
+            for number in range(start, start + count)
+        ])
+
+    def page(self, number, **params):
+        return self.client.get('/api/menu/', {'page': number, 'ordering': 'title', **params})
+
+    def test_counts_below_the_threshold_are_exact(self):
+        with override_settings(ESTIMATED_COUNT_THRESHOLD=100):
+            self.assertEqual(approximate_count(MenuItem.objects.all()), (12, False))
+            self.add_items(1)
+            self.assertEqual(approximate_count(MenuItem.objects.all()), (13, False))
+
+    def test_counts_over_the_threshold_are_cached(self):
+        items = MenuItem.objects.filter(price__gt=0)
+        self.assertEqual(approximate_count(items), (12, False))
+        self.add_items(3)
+
+        self.assertEqual(approximate_count(items), (12, True))
+
+    def test_table_statistics_are_used_for_unfiltered_querysets_only(self):
+        with STATISTICS:
+            self.assertEqual(estimated_count(MenuItem.objects.all()), 40)
+            self.assertIsNone(estimated_count(MenuItem.objects.filter(featured=True)))
+            self.assertEqual(approximate_count(MenuItem.objects.all()), (40, True))
+        self.assertIsNone(estimated_count(MenuItem.objects.all()))
+
+    def test_exact_count_response(self):
+        with override_settings(ESTIMATED_COUNT_THRESHOLD=100):
+            data = self.page(2).data
+
+        self.assertEqual((data['count'], data['count_approximate']), (12, False))
+        self.assertIn('page=3', data['next'])
+        self.assertNotIn('page=', data['previous'])
+        self.assertEqual(len(data['results']), 5)
+
+    def test_estimated_count_links_follow_the_rows(self):
+        with STATISTICS:
+            first, last, past_the_rows = self.page(1).data, self.page(3).data, self.page(4)
+
+        self.assertEqual((first['count'], first['count_approximate']), (40, True))
+        self.assertIn('page=2', first['next'])
+        self.assertIsNone(first['previous'])
+        # The estimate promises 8 pages, the rows end on page 3
+        self.assertEqual([item['title'] for item in last['results']], ['Item 10', 'Item 11'])
+        self.assertIsNone(last['next'])
+        self.assertIn('page=2', last['previous'])
+        self.assertEqual(past_the_rows.status_code, 404)
+
+    def test_estimated_count_with_a_full_last_page(self):
+        self.add_items(3)
+        with STATISTICS:
+            data = self.page(3).data
+
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class GroupMembershipBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.managers = Group.objects.create(name='Manager')
+        self.crew = Group.objects.create(name='Delivery Crew')
+        boss = User.objects.create_user('boss')
+        boss.groups.add(self.managers)
+        self.client = APIClient()
+        self.client.force_authenticate(boss)
+        self.users = [User.objects.create_user(f'user{number}') for number in range(1, 11)]
+
+    def batch(self, method, users):
+        return getattr(self.client, method)('/api/delivery/batch/', {'users': users}, format='json')
+
+    def test_adds_by_id_and_username(self):
+        self.users[0].groups.add(self.crew)
+
+        response = self.batch('post', [self.users[0].id, self.users[1].id, 'user3', 'nobody', 999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'added': ['user2', 'user3'], 'already_members': ['user1'],
+                                           'not_found': ['nobody', 999]})
+        self.assertEqual(set(self.crew.user_set.values_list('username', flat=True)), {'user1', 'user2', 'user3'})
+
+    def test_removes(self):
+        self.users[0].groups.add(self.crew)
+
+        response = self.batch('delete', ['user1', 'user2'])
+
+        self.assertEqual(response.json(), {'removed': ['user1'], 'not_members': ['user2'], 'not_found': []})
+        self.assertFalse(self.crew.user_set.exists())
+
+    def test_booleans_and_other_types_are_rejected(self):
+        for entry in (True, False, None, 1.5, {'id': 1}, [1]):
+            with self.subTest(entry=entry):
+                response = self.batch('post', [self.users[1].id, entry])
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['invalid'], [entry])
+        self.assertFalse(self.crew.user_set.exists())
+
+    def test_query_count_does_not_grow_with_the_users(self):
+        for method in ('post', 'delete'):
+            with self.subTest(method=method):
+                with CaptureQueriesContext(connection) as one_user:
+                    self.batch(method, [self.users[0].id])
+                many = [user.id for user in self.users[1:6]] + [user.username for user in self.users[6:]]
+
+                with self.assertNumQueries(len(one_user)):
+                    response = self.batch(method, many)
+
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import Cart, Category, IdempotencyKey, MenuItem
+
+
+class IdempotencyKeyTests(TestCase):
+    databases = {'default', 'downtown'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('joe')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+
+    def add_soup(self, quantity=1, key='key-1', location='main'):
+        return self.client.post('/api/cart/', {'menuitem_id': self.soup.id, 'quantity': quantity}, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key, HTTP_X_LOCATION=location)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.add_soup()
+        retry = self.add_soup()
+
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.add_soup(quantity=1)
+
+        response = self.add_soup(quantity=2)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+
+    def test_key_held_by_a_running_request_conflicts(self):
+        self.add_soup()
+        IdempotencyKey.objects.filter(key='key-1').update(status_code=None, response=None, locked_at=timezone.now())
+
+        response = self.add_soup()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_key_whose_lease_ran_out_is_taken_over(self):
+        self.add_soup()
+        Cart.objects.all().delete()
+        crashed_at = timezone.now() - timedelta(minutes=5)
+        IdempotencyKey.objects.filter(key='key-1').update(status_code=None, response=None, locked_at=crashed_at)
+
+        response = self.add_soup()
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 1)
+        record = IdempotencyKey.objects.get(key='key-1')
+        self.assertEqual(record.status_code, response.status_code)
+        self.assertGreater(record.locked_at, crashed_at)
+
+    def test_request_that_lost_its_lease_is_rolled_back(self):
+        def take_over(**kwargs):
+            IdempotencyKey.objects.filter(key='key-1').update(locked_at=timezone.now() + timedelta(seconds=1))
+        post_save.connect(take_over, sender=Cart)
+        self.addCleanup(post_save.disconnect, take_over, sender=Cart)
+
+        response = self.add_soup()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Cart.objects.exists())
+        self.assertIsNone(IdempotencyKey.objects.get(key='key-1').status_code)
+
+    def test_keys_are_kept_per_location_in_its_shard(self):
+        self.add_soup(location='main')
+
+        response = self.add_soup(location='downtown')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Cart.objects.using('downtown').get(user=self.user).quantity, 1)
+        main_key = IdempotencyKey.objects.using('default').get(key='key-1')
+        downtown_key = IdempotencyKey.objects.using('downtown').get(key='key-1')
+        self.assertNotEqual(main_key.fingerprint, downtown_key.fingerprint)
@@ -0,0 +1,77 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from LittleLemonAPI.models import OutboxEvent
+from LittleLemonAPI.outbox import ORDER_CREATED, relay_batch
+
+from .test_sharding import ShardTestCase
+
+
+class ListSink:
+    def __init__(self, fail=False):
+        self.messages = []
+        self.fail = fail
+
+    def send(self, messages):
+        if self.fail:
+            raise ConnectionError('sink is down')
+        self.messages.extend(messages)
+
+    def close(self):
+        pass
+
+
+class OutboxRelayTests(ShardTestCase):
+    def test_relay_delivers_the_events_of_each_database_and_deletes_them(self):
+        main_order = self.checkout(self.joe, 'main', (self.soup, 1))
+        downtown_order = self.checkout(self.ann, 'downtown', (self.soup, 2))
+        sink = ListSink()
+
+        relay_batch('default', sink, 10)
+        relay_batch('downtown', sink, 10)
+
+        self.assertEqual([(m['event'], m['payload']['order_id'], m['payload']['location']) for m in sink.messages],
+                         [(ORDER_CREATED, main_order, 'main'), (ORDER_CREATED, downtown_order, 'downtown')])
+        self.assertEqual([m['id'].split(':')[0] for m in sink.messages], ['main', 'downtown'])
+        self.assertFalse(OutboxEvent.objects.using('default').exists())
+        self.assertFalse(OutboxEvent.objects.using('downtown').exists())
+
+    def test_events_stay_queued_when_the_sink_fails(self):
+        self.checkout(self.joe, 'downtown', (self.soup, 1))
+
+        with self.assertRaises(ConnectionError):
+            relay_batch('downtown', ListSink(fail=True), 10)
+
+        self.assertEqual(OutboxEvent.objects.using('downtown').count(), 1)
+        sink = ListSink()
+        relay_batch('downtown', sink, 10)
+        self.assertEqual(len(sink.messages), 1)
+
+    def test_relay_sends_in_batches_in_write_order(self):
+        client = self.client_for(self.boss)
+        for price in ('3.50', '4.00', '4.50'):
+            response = client.patch(f'/api/menu/{self.soup.id}/', {'price': price}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+        sink = ListSink()
+
+        self.assertEqual(len(relay_batch('default', sink, 2)), 2)
+        self.assertEqual(len(relay_batch('default', sink, 2)), 1)
+        self.assertEqual(relay_batch('default', sink, 2), [])
+
+        self.assertEqual([m['payload']['new_price'] for m in sink.messages], ['3.50', '4.00', '4.50'])
+
+    def test_command_writes_ndjson(self):
+        order_id = self.checkout(self.joe, 'downtown', (self.soup, 1))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'outbox.ndjson'
+            with override_settings(OUTBOX_SINK_OPTIONS={'path': path}):
+                call_command('relay_outbox', '--once', stdout=StringIO())
+
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual([(line['event'], line['aggregate_id']) for line in lines], [(ORDER_CREATED, order_id)])
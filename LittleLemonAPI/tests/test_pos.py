@@ -0,0 +1,136 @@
+import json
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from LittleLemonAPI import pos
+from LittleLemonAPI.models import Category, IngestCheckpoint, MenuItem, Order, OrderItem
+
+"""
+    The ingest_pos command end to end. Its workers are spawned processes,
+    so the tests also cover starting them without a forked Django.
+"""
+
+
+class IngestPosTests(TestCase):
+    databases = {'default', 'downtown'}
+
+    def setUp(self):
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.salad = MenuItem.objects.create(title='Greek Salad', price=Decimal('12.50'), featured=False,
+                                             category=category)
+        MenuItem.objects.create(title='Bruschetta', price=Decimal('8.00'), featured=False, category=category)
+        self.counter = User.objects.create_user('counter')
+        User.objects.create_user('ann')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def export(self, name, lines):
+        path = self.directory / name
+        path.write_text(''.join(line + '\n' for line in lines))
+        return str(path)
+
+    def ndjson(self, *records):
+        return self.export('export.ndjson', [json.dumps(record) for record in records])
+
+    def ingest(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('ingest_pos', path, '--workers', '1', '--location', 'downtown', '--user', 'counter', *args,
+                     stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def record(self, pos_id, **fields):
+        return {'pos_id': pos_id, 'date': '2026-03-01',
+                'items': [{'title': 'Greek Salad', 'quantity': 2, 'unit_price': '12.00'}], **fields}
+
+    def test_ingests_orders_into_the_location_shard(self):
+        path = self.ndjson(
+            self.record('A-1'),
+            self.record('A-2', user='ann', status=False,
+                        items=[{'title': 'Bruschetta', 'quantity': 1}, {'title': 'Greek Salad', 'quantity': 1}]),
+        )
+
+        out, err = self.ingest(path)
+
+        self.assertIn('2 orders and 3 items written', out)
+        self.assertEqual(err, '')
+        orders = {order.pos_ref: order for order in Order.objects.using('downtown').all()}
+        self.assertEqual(orders['A-1'].total, Decimal('24.00'))
+        self.assertEqual(orders['A-1'].user_id, self.counter.id)
+        self.assertEqual(orders['A-1'].date, date(2026, 3, 1))
+        self.assertEqual(orders['A-2'].total, Decimal('20.50'))
+        self.assertEqual(orders['A-2'].user.username, 'ann')
+        self.assertFalse(orders['A-2'].status)
+        self.assertEqual(OrderItem.objects.using('downtown').count(), 3)
+        self.assertFalse(Order.objects.using('default').exists())
+        self.assertEqual(IngestCheckpoint.objects.using('downtown').get(source='export.ndjson').position, 2)
+
+    def test_csv_export(self):
+        path = self.export('export.csv', [
+            'pos_id,user,date,status,title,quantity,unit_price',
+            'C-1,,2026-03-02,true,Greek Salad,1,',
+            'C-1,,2026-03-02,true,Bruschetta,2,7.50',
+        ])
+
+        self.ingest(path)
+
+        order = Order.objects.using('downtown').get(pos_ref='C-1')
+        self.assertEqual(order.total, Decimal('27.50'))
+
+    def test_bad_records_are_rejected_and_the_rest_written(self):
+        path = self.export('export.ndjson', [
+            json.dumps(self.record('B-1')),
+            json.dumps(self.record('B-2', items=[{'title': 'Pizza', 'quantity': 1}])),
+            json.dumps(self.record('B-3', items=[{'title': 'Greek Salad', 'quantity': -1}])),
+            json.dumps(self.record('B-4', user='nobody')),
+            json.dumps(self.record('B-5', date='yesterday')),
+            '{not json',
+            json.dumps(self.record('B-6')),
+        ])
+
+        out, err = self.ingest(path)
+
+        self.assertEqual(set(Order.objects.using('downtown').values_list('pos_ref', flat=True)), {'B-1', 'B-6'})
+        self.assertIn('5 rejected', out)
+        self.assertIn("record 2: InvalidRecord: unknown menu item 'Pizza'", err)
+        self.assertIn("B-4: unknown user 'nobody'", err)
+        self.assertIn('record 6: JSONDecodeError', err)
+
+    def test_resumes_after_an_interrupted_run(self):
+        path = self.ndjson(self.record('R-1'), self.record('R-2'), self.record('R-3'))
+        write_batch = pos.write_batch
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return write_batch(*args, **kwargs)
+
+        with mock.patch('LittleLemonAPI.management.commands.ingest_pos.write_batch', side_effect=interrupted), \
+                self.assertRaises(KeyboardInterrupt):
+            self.ingest(path, '--batch-size', '1')
+        self.assertEqual(IngestCheckpoint.objects.using('downtown').get().position, 1)
+
+        out, _ = self.ingest(path, '--batch-size', '1')
+
+        self.assertIn('Resuming export.ndjson after record 1', out)
+        self.assertEqual(sorted(Order.objects.using('downtown').values_list('pos_ref', flat=True)),
+                         ['R-1', 'R-2', 'R-3'])
+
+    def test_rerun_skips_ingested_records(self):
+        path = self.ndjson(self.record('D-1'))
+        self.ingest(path)
+
+        out, _ = self.ingest(path, '--restart')
+
+        self.assertIn('1 already ingested', out)
+        self.assertEqual(Order.objects.using('downtown').count(), 1)
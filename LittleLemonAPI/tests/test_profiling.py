@@ -0,0 +1,51 @@
+import tracemalloc
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import ProfileCapture
+from LittleLemonAPI.profiling import _lock
+from LittleLemonAPI.views import CategoryList
+
+
+class ProfiledViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('boss', is_staff=True))
+
+    def test_requested_profile_is_stored(self):
+        response = self.client.get('/api/categories/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile-Id'], str(ProfileCapture.objects.get().id))
+
+    def test_failed_capture_is_logged_and_the_response_sent(self):
+        with mock.patch.object(ProfileCapture.objects, 'create', side_effect=DatabaseError('gone')), \
+                self.assertLogs('LittleLemonAPI.profiling', 'ERROR'):
+            response = self.client.get('/api/categories/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(_lock.locked())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_handler_that_raises_is_captured_and_frees_the_profiler(self):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(User.objects.get(username='boss'))
+        with mock.patch.object(CategoryList, 'list', side_effect=RuntimeError('boom')):
+            response = client.get('/api/categories/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(ProfileCapture.objects.get().status_code, 500)
+        self.assertFalse(_lock.locked())
+        self.assertFalse(tracemalloc.is_tracing())
+
+        response = self.client.get('/api/categories/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(response['X-Profile-Id'], str(ProfileCapture.objects.latest('id').id))
+        self.assertEqual(ProfileCapture.objects.count(), 2)
@@ -0,0 +1,104 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from LittleLemon.routers import end_request, pin_key, start_request
+from LittleLemonAPI.models import Cart, Category, MenuItem
+
+"""
+    PrimaryReplicaRouter with 'replica' mirroring 'default' (LittleLemon.settings_test).
+    The replica is another connection to the same database, so the tests commit their rows.
+"""
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    databases = {'default', 'downtown', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+        self.joe = User.objects.create_user('joe')
+        self.ann = User.objects.create_user('ann')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def routed(self, method):
+        """ (read alias, write alias) of a menu item inside a request of method """
+        token = start_request(getattr(RequestFactory(), method)('/'))
+        try:
+            return router.db_for_read(MenuItem), router.db_for_write(MenuItem)
+        finally:
+            end_request(token)
+
+    def reads_replica(self, client):
+        """ Whether listing the categories queried the replica rather than the primary """
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            self.assertEqual(client.get('/api/categories/').status_code, 200)
+        self.assertTrue(len(replica) or len(primary))
+        self.assertFalse(len(replica) and len(primary))
+        return bool(len(replica))
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        self.assertEqual(self.routed('get'), ('replica', 'default'))
+
+    def test_reads_inside_a_write_request_stay_on_the_primary(self):
+        self.assertEqual(self.routed('post'), ('default', 'default'))
+
+    def test_reads_after_a_write_in_the_same_request_stay_on_the_primary(self):
+        token = start_request(RequestFactory().get('/'))
+        try:
+            self.assertEqual(router.db_for_read(MenuItem), 'replica')
+            router.db_for_write(MenuItem)
+            self.assertEqual(router.db_for_read(MenuItem), 'default')
+        finally:
+            end_request(token)
+
+    def test_reads_outside_a_request_and_of_shards_skip_the_replica(self):
+        self.assertEqual(router.db_for_read(MenuItem), 'default')
+        token = start_request(RequestFactory().get('/'))
+        try:
+            self.assertEqual(router.db_for_read(Cart), 'default')
+        finally:
+            end_request(token)
+
+    def test_a_write_pins_the_user_to_the_primary_for_the_pin_window(self):
+        joe, ann = self.client_for(self.joe), self.client_for(self.ann)
+        self.assertTrue(self.reads_replica(joe))
+
+        response = joe.post('/api/cart/', {'menuitem_id': self.soup.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertTrue(cache.get(pin_key(self.joe.pk)))
+        self.assertFalse(self.reads_replica(joe))
+        self.assertTrue(self.reads_replica(ann))
+
+    def test_the_pin_expires(self):
+        joe = self.client_for(self.joe)
+        joe.post('/api/cart/', {'menuitem_id': self.soup.id, 'quantity': 1}, format='json')
+        self.assertFalse(self.reads_replica(joe))
+
+        pinned_at = time.time()
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=pinned_at + 6):
+            self.assertIsNone(cache.get(pin_key(self.joe.pk)))
+            self.assertTrue(self.reads_replica(joe))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_no_pin(self):
+        joe = self.client_for(self.joe)
+        joe.post('/api/cart/', {'menuitem_id': self.soup.id, 'quantity': 1}, format='json')
+
+        self.assertIsNone(cache.get(pin_key(self.joe.pk)))
+        self.assertFalse(self.reads_replica(joe))
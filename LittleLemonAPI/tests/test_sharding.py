@@ -0,0 +1,160 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from LittleLemon.sharding import ShardedQuerySet
+from LittleLemonAPI.jobs import run_batch
+from LittleLemonAPI.models import Cart, Category, ChangeLog, Job, MenuItem, Order, OrderItem, OutboxEvent
+
+"""
+    Carts and orders of the 'downtown' location live in the 'downtown' database,
+    users and the menu in 'default' (LittleLemon.settings_test).
+    ?location=all reads the shards in threads, so the tests commit their rows.
+"""
+
+
+class ShardTestCase(TransactionTestCase):
+    databases = {'default', 'downtown'}
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='Mains', slug='mains')
+        self.soup = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+        self.apple_pie = MenuItem.objects.create(title='Apple pie', price=Decimal('5.00'), featured=False,
+                                                 category=category)
+        self.joe = User.objects.create_user('joe')
+        self.ann = User.objects.create_user('ann')
+        self.boss = User.objects.create_user('boss', is_staff=True, is_superuser=True)
+        self.boss.groups.add(Group.objects.create(name='Manager'))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def add_to_cart(self, client, menuitem, quantity, location):
+        response = client.post('/api/cart/', {'menuitem_id': menuitem.id, 'quantity': quantity},
+                               format='json', HTTP_X_LOCATION=location)
+        self.assertIn(response.status_code, (200, 201), response.content)
+
+    def checkout(self, user, location, *lines):
+        client = self.client_for(user)
+        for menuitem, quantity in lines:
+            self.add_to_cart(client, menuitem, quantity, location)
+        response = client.post('/api/orders/', HTTP_X_LOCATION=location)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['order_id']
+
+
+class CheckoutTests(ShardTestCase):
+    def test_checkout_writes_order_and_its_records_to_the_shard(self):
+        order_id = self.checkout(self.joe, 'downtown', (self.soup, 2))
+
+        order = Order.objects.using('downtown').get(pk=order_id)
+        self.assertEqual(order.total, Decimal('6.00'))
+        self.assertEqual(OrderItem.objects.using('downtown').filter(order_id=order_id).count(), 1)
+        self.assertFalse(Order.objects.using('default').exists())
+        self.assertFalse(Cart.objects.using('downtown').exists())
+
+        self.assertEqual(Job.objects.using('downtown').get().payload, {'order_id': order_id, 'location': 'downtown'})
+        self.assertFalse(Job.objects.using('default').exists())
+        self.assertTrue(ChangeLog.objects.using('downtown').filter(model='order', object_id=order_id,
+                                                                   location='downtown').exists())
+        self.assertFalse(ChangeLog.objects.using('default').filter(model='order').exists())
+        self.assertEqual(OutboxEvent.objects.using('downtown').get().aggregate_id, order_id)
+
+    def test_order_placed_job_runs_from_the_shard(self):
+        self.checkout(self.joe, 'downtown', (self.soup, 2))
+        self.checkout(self.joe, 'main', (self.soup, 1))
+
+        self.assertEqual(run_batch(10), (2, 0))
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.sales_30d, 3)
+        self.assertFalse(Job.objects.using('downtown').exists())
+
+    def test_reorder_copies_to_the_cart_of_the_order_location(self):
+        order_id = self.checkout(self.joe, 'downtown', (self.soup, 2), (self.apple_pie, 1))
+
+        response = self.client_for(self.joe).post(f'/api/orders/{order_id}/reorder/', HTTP_X_LOCATION='downtown')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(Cart.objects.using('downtown').values_list('menuitem_id', 'quantity')),
+                         {(self.soup.id, 2), (self.apple_pie.id, 1)})
+        self.assertFalse(Cart.objects.using('default').exists())
+
+
+class AllLocationsTests(ShardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.checkout(self.joe, 'main', (self.soup, 1))
+        self.checkout(self.joe, 'downtown', (self.soup, 3))
+        self.checkout(self.ann, 'downtown', (self.apple_pie, 1))
+        self.checkout(self.ann, 'main', (self.soup, 4))
+        self.boss_client = self.client_for(self.boss)
+
+    def list_orders(self, **params):
+        response = self.boss_client.get('/api/orders/', {'location': 'all', 'fields': 'id,location,total', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_merges_and_counts_every_location(self):
+        data = self.list_orders(ordering='total')
+
+        self.assertEqual(data['count'], 4)
+        self.assertEqual([(row['location'], row['total']) for row in data['results']],
+                         [('main', '3.00'), ('downtown', '5.00'), ('downtown', '9.00'), ('main', '12.00')])
+
+    def test_pages_through_the_merged_order(self):
+        data = self.list_orders(ordering='-total', perpage=2, page=2)
+
+        self.assertEqual([row['total'] for row in data['results']], ['5.00', '3.00'])
+
+    def test_search_resolves_usernames_on_default(self):
+        data = self.list_orders(search='ann', ordering='total')
+
+        self.assertEqual([row['total'] for row in data['results']], ['5.00', '12.00'])
+
+    def test_ordering_by_user(self):
+        data = self.list_orders(ordering='user,total', fields='user,total')
+
+        self.assertEqual([(row['user'], row['total']) for row in data['results']],
+                         [(self.joe.id, '3.00'), (self.joe.id, '9.00'),
+                          (self.ann.id, '5.00'), (self.ann.id, '12.00')])
+
+    def test_related_ordering_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ShardedQuerySet(Order.objects.order_by('user__username'))
+
+
+class CartSearchTests(ShardTestCase):
+    def test_search_and_ordering_by_menu_item_title(self):
+        client = self.client_for(self.joe)
+        self.add_to_cart(client, self.soup, 1, 'downtown')
+        self.add_to_cart(client, self.apple_pie, 2, 'downtown')
+
+        response = client.get('/api/cart/', {'ordering': 'menuitem__title'}, HTTP_X_LOCATION='downtown')
+        self.assertEqual([row['menuitem'] for row in response.data['results']], [self.apple_pie.id, self.soup.id])
+
+        response = client.get('/api/cart/', {'ordering': '-menuitem__title'}, HTTP_X_LOCATION='downtown')
+        self.assertEqual([row['menuitem'] for row in response.data['results']], [self.soup.id, self.apple_pie.id])
+
+        response = client.get('/api/cart/', {'search': 'pie'}, HTTP_X_LOCATION='downtown')
+        self.assertEqual([row['menuitem'] for row in response.data['results']], [self.apple_pie.id])
+
+
+class AdminTests(ShardTestCase):
+    def test_changelists_read_the_shard_and_the_users_from_default(self):
+        self.checkout(self.joe, 'downtown', (self.soup, 1))
+        self.add_to_cart(self.client_for(self.ann), self.apple_pie, 1, 'downtown')
+        self.client.force_login(self.boss)
+
+        for model in ('order', 'cart', 'orderitem'):
+            response = self.client.get(f'/admin/LittleLemonAPI/{model}/', HTTP_X_LOCATION='downtown')
+            self.assertEqual(response.status_code, 200, model)
+        response = self.client.get('/admin/LittleLemonAPI/order/', HTTP_X_LOCATION='downtown')
+        self.assertContains(response, '<td class="field-user nowrap">joe</td>', html=False)
+        response = self.client.get('/admin/LittleLemonAPI/cart/', HTTP_X_LOCATION='downtown')
+        self.assertContains(response, '<td class="field-user nowrap">ann</td>', html=False)
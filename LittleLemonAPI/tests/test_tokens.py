@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from LittleLemonAPI.tokens import RevocationSet
+
+
+class RevocationSetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('joe')
+        self.revocations = RevocationSet()
+        self.revocations.reload()
+
+    def blacklist(self, jti, age=timedelta(0), **fields):
+        token = OutstandingToken.objects.create(user=self.user, jti=jti, token=jti,
+                                                expires_at=timezone.now() + timedelta(days=1))
+        row = BlacklistedToken.objects.create(token=token, **fields)
+        BlacklistedToken.objects.filter(pk=row.pk).update(blacklisted_at=timezone.now() - age)
+        return row
+
+    def test_refresh_picks_up_new_rows(self):
+        self.blacklist('a')
+
+        self.revocations.refresh()
+
+        self.assertIn('a', self.revocations.jtis)
+
+    def test_refresh_picks_up_a_row_that_committed_after_a_higher_id(self):
+        self.blacklist('later', id=10)
+        self.revocations.refresh()
+
+        self.blacklist('late', id=5)
+        self.revocations.refresh()
+
+        self.assertEqual(self.revocations.jtis, {'later', 'late'})
+
+    def test_rows_older_than_the_commit_window_are_not_read_again(self):
+        self.blacklist('old', age=timedelta(hours=1), id=3)
+        self.blacklist('young', id=4)
+
+        self.revocations.refresh()
+        self.assertEqual(self.revocations.settled_id, 3)
+
+        self.revocations.reload()
+        self.assertEqual(self.revocations.settled_id, 3)
+        self.assertEqual(self.revocations.jtis, {'old', 'young'})
+
+    def test_settled_rows_stop_below_an_unsettled_one(self):
+        self.blacklist('young', id=4)
+        self.blacklist('old', age=timedelta(hours=1), id=6)
+
+        self.revocations.refresh()
+
+        self.assertEqual(self.revocations.settled_id, 0)
@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers, tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+"""
+    Refresh token revocation checks without a database query per check.
+
+    Each worker keeps the JTIs of the blacklisted, unexpired tokens in memory.
+    The set is brought up to date with the rows after the last one older than
+    TOKEN_REVOCATION_COMMIT_WINDOW_SECONDS at most every TOKEN_REVOCATION_REFRESH_SECONDS,
+    so a row that commits after rows with higher ids is not skipped, and reloaded in full every
+    TOKEN_REVOCATION_RELOAD_SECONDS to drop expired and pruned tokens.
+    A token blacklisted by another worker is therefore rejected everywhere within
+    TOKEN_REVOCATION_REFRESH_SECONDS, and immediately by the worker that blacklisted it.
+"""
+
+
+class RevocationSet:
+    def __init__(self):
+        self.jtis = set()
+        # Every blacklist row up to this id is older than the commit window and was read
+        self.settled_id = 0
+        self.refreshed_at = None
+        self.reloaded_at = None
+        self.lock = threading.Lock()
+
+    def settled_before(self):
+        return timezone.now() - timedelta(seconds=settings.TOKEN_REVOCATION_COMMIT_WINDOW_SECONDS)
+
+    def reload(self):
+        settled = (BlacklistedToken.objects.filter(blacklisted_at__lt=self.settled_before())
+                   .order_by('-id').values_list('id', flat=True).first())
+        self.jtis = set(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                        .values_list('token__jti', flat=True))
+        self.settled_id = settled or 0
+        self.reloaded_at = time.monotonic()
+
+    def refresh(self):
+        settled_before = self.settled_before()
+        rows = (BlacklistedToken.objects.filter(id__gt=self.settled_id)
+                .values_list('id', 'token__jti', 'blacklisted_at'))
+        settled, unsettled = [], []
+        for row_id, jti, blacklisted_at in rows:
+            self.jtis.add(jti)
+            (settled if blacklisted_at < settled_before else unsettled).append(row_id)
+        # Stop below the first unsettled row, the rows around it may still commit
+        below = min(unsettled, default=None)
+        self.settled_id = max([self.settled_id, *(i for i in settled if below is None or i < below)])
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self.refreshed_at is not None and now - self.refreshed_at < settings.TOKEN_REVOCATION_REFRESH_SECONDS:
+            return
+        with self.lock:
+            if self.reloaded_at is None or now - self.reloaded_at >= settings.TOKEN_REVOCATION_RELOAD_SECONDS:
+                self.reload()
+            else:
+                self.refresh()
+            self.refreshed_at = now
+
+    def __contains__(self, jti):
+        self.ensure_fresh()
+        return jti in self.jtis
+
+    def add(self, jti):
+        self.jtis.add(jti)
+
+
+revocations = RevocationSet()
+
+
+class RefreshToken(tokens.RefreshToken):
+    """ RefreshToken checked against the in-memory revocation set """
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in revocations:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        revocations.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class TokenBlacklistSerializer(serializers.TokenBlacklistSerializer):
+    token_class = RefreshToken
@@ -6,13 +6,23 @@ urlpatterns = [
     path('categories/', views.CategoryList.as_view(), name='categories'),
     path('categories/<int:pk>/', views.singleCategory.as_view(), name='single_category'),
     path('menu/', views.MenuItemList.as_view(), name='menu'),
+    path('menu/top/', views.TopMenuItems.as_view(), name='top_menu_items'),
     path('menu/<int:pk>/', views.SingleMenuItem.as_view(), name='single_menu_item'),
     path('manager/', views.ManagerList.as_view(), name='manager'),
     path('manager/<int:pk>/', views.ManagerRemove.as_view(), name='single_manager'),
+    path('manager/batch/', views.ManagerBatch.as_view(), name='manager_batch'),
     path('delivery/', views.DeliveryCrewList.as_view(), name='delivery-crew'),
     path('delivery/<int:pk>/', views.DeliveryCrewRemove.as_view(), name='single_delivery_crew'),
+    path('delivery/batch/', views.DeliveryCrewBatch.as_view(), name='delivery_crew_batch'),
     path('cart/', views.CartList.as_view(), name='cart'),
+    path('cart/summary/', views.CartSummary.as_view(), name='cart_summary'),
     path('cart/<int:pk>/', views.SingleCartItem.as_view(), name='single_cart_item'),
     path('orders/', views.OrderList.as_view(), name='orders'),
     path('orders/<int:pk>/', views.SingleOrder.as_view(), name='single_order'),
+    path('orders/<int:pk>/reorder/', views.ReorderOrder.as_view(), name='reorder'),
+    path('changes/', views.ChangeFeed.as_view(), name='changes'),
+    path('profiles/', views.ProfileCaptureList.as_view(), name='profiles'),
+    path('profiles/<int:pk>/', views.SingleProfileCapture.as_view(), name='single_profile'),
+    path('admission/', views.AdmissionStats.as_view(), name='admission'),
+    path('schema/', views.openapi_schema, name='openapi_schema'),
 ]
\ No newline at end of file
@@ -1,21 +1,64 @@
 
 import math
+import os
+from datetime import timedelta
 from rest_framework import generics
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.models import User, Group
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q, F, Window
+from django.db.models.functions import RowNumber
 from decimal import Decimal
 
-from .models import MenuItem, Cart, Order, OrderItem, Category
+from LittleLemon.admission import controller
+from LittleLemon.sharding import ALL, ShardedQuerySet, current_location, current_shard
+
+from .models import MenuItem, Cart, Order, OrderItem, Category, ChangeLog, ArchivedOrder, ArchivedOrderItem, ProfileCapture
 from .serializers import CategorySerializer, MenuItemSerializer, CartSerializer, OrderSerializer, UserSerializer, OrderUpdateSerializer
+from .serializers import ArchivedOrderSerializer, ProfileCaptureSerializer, CartSummarySerializer
+from .serializers import requested, renders
 from .permissions import IsManager
+from .filters import OrderFilter, ArchivedOrderFilter
 from .paginations import CategoryListPagination, MenuItemListPagination, OrderListPagination, CartListPagination
+from .jobs import enqueue
+from .idempotency import idempotent
+from .carts import copy_order_to_cart, cart_summary, invalidate_summaries
+from .profiling import ProfiledViewMixin
+from .outbox import publish, order_created, order_updated, menuitem_price_changed
+from .outbox import ORDER_CREATED, ORDER_UPDATED, MENUITEM_PRICE_CHANGED
+from .schema import ApiAutoSchema, document
+
+def with_menu_item_relations(request, queryset):
+    """ Join the category only when ?expand=category renders it """
+    if 'category' in requested(request, 'expand') and renders(request, 'category'):
+        queryset = queryset.select_related('category')
+    return queryset
+
+
+def with_order_relations(request, queryset):
+    """ Prefetch order items only when they are rendered, with their menu items for ?expand=orderitem """
+    if not renders(request, 'orderitem'):
+        return queryset
+    if 'orderitem' in requested(request, 'expand'):
+        # Prefetched rather than joined, menu items are not in the location shards
+        return queryset.prefetch_related('order__menuitem')
+    return queryset.prefetch_related('order')
+
+
+def reads_archive(request):
+    """ ?archived=true reads delivered orders moved to the archive, which are read-only """
+    return request.method in ('GET', 'HEAD') and request.query_params.get('archived') in ('1', 'true')
+
 
 # Create your views here.
-class CategoryList(generics.ListCreateAPIView):
+class CategoryList(ProfiledViewMixin, generics.ListCreateAPIView):
     """
     List all categories or create a new one.
     Only managers can create new categories
@@ -39,7 +82,7 @@ class CategoryList(generics.ListCreateAPIView):
             permission_classes = [IsAuthenticated, IsManager]
         return [permission() for permission in permission_classes]
 
-class singleCategory(generics.RetrieveUpdateDestroyAPIView):
+class singleCategory(ProfiledViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a category.
     Only managers can update or delete categories.
@@ -58,14 +101,17 @@ class singleCategory(generics.RetrieveUpdateDestroyAPIView):
             permission_classes = [IsAuthenticated, IsManager]
         return [permission() for permission in permission_classes]
     
-class MenuItemList(generics.ListCreateAPIView):
+class MenuItemList(ProfiledViewMixin, generics.ListCreateAPIView):
 
     """
     List all menu items or create a new one.
     Only managers can create new menu items
     and only authenticated users can view the list.
     The list is paginated and can be filtered by title and category.
-    The results can be ordered by title and price.
+    The results can be ordered by title, price and popularity,
+    ?ordering=-popularity lists the best sellers first.
+    Responses can be limited to ?fields=id,title and the category
+    nested with ?expand=category.
     The API is rate-limited to 10 requests per minute for authenticated users
     and 5 requests per minute for anonymous users.
 
@@ -74,16 +120,58 @@ class MenuItemList(generics.ListCreateAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     search_fields = ['title', 'category__title']
-    ordering_fields = ['title', 'price']
+    ordering_fields = ['title', 'price', 'popularity']
     pagination_class = MenuItemListPagination
 
+    def get_queryset(self):
+        return with_menu_item_relations(self.request, super().get_queryset())
+
     def get_permissions(self):
         permission_classes = []
         if self.request.method != 'GET':
                 permission_classes = [IsAuthenticated,IsManager]
         return[permission() for permission in permission_classes]
     
-class SingleMenuItem(generics.RetrieveUpdateDestroyAPIView):
+class TopMenuItems(ProfiledViewMixin, generics.GenericAPIView):
+    """
+    List the best selling menu items of each category, ?limit= per category
+    (MENU_TOP_DEFAULT by default, at most MENU_TOP_MAX).
+    Items are ranked by their precomputed popularity, see popularity.py.
+    Responses can be limited with ?fields= like the menu item list.
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    serializer_class = MenuItemSerializer
+    schema = ApiAutoSchema(operation_id_base='TopMenuItem')
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', settings.MENU_TOP_DEFAULT)), settings.MENU_TOP_MAX)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=400)
+
+        ranked = MenuItem.objects.annotate(
+            rank=Window(RowNumber(), partition_by=F('category_id'), order_by=[F('popularity').desc(), F('id')])
+        ).filter(rank__lte=limit, popularity__gt=0).order_by('category_id', 'rank')
+
+        categories = {category.id: category for category in Category.objects.filter(
+            id__in={item.category_id for item in ranked})}
+        results = {}
+        for item in ranked:
+            results.setdefault(item.category_id, []).append(item)
+        return Response([
+            {
+                'category': CategorySerializer(categories[category_id]).data,
+                'items': self.get_serializer(items, many=True).data,
+            }
+            for category_id, items in results.items()
+        ])
+
+
+class SingleMenuItem(ProfiledViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a menu item.
     Only managers can update or delete menu items.
@@ -96,13 +184,26 @@ class SingleMenuItem(generics.RetrieveUpdateDestroyAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
 
+    def get_queryset(self):
+        return with_menu_item_relations(self.request, super().get_queryset())
+
     def get_permissions(self):
         permission_classes = []
         if self.request.method != 'GET':
                 permission_classes = [IsAuthenticated,IsManager]
         return[permission() for permission in permission_classes]
+
+    def perform_update(self, serializer):
+        old_price = serializer.instance.price
+        using = router.db_for_write(MenuItem)
+        with transaction.atomic(using=using):
+            menuitem = serializer.save()
+            if menuitem.price != old_price:
+                publish(MenuItem, using, [
+                    (menuitem.id, MENUITEM_PRICE_CHANGED, menuitem_price_changed(menuitem, old_price)),
+                ])
     
-class ManagerList(generics.ListCreateAPIView):
+class ManagerList(ProfiledViewMixin, generics.ListCreateAPIView):
     """
     List all users in the Manager group or add a new user to the Manager group.
     Only authenticated users with the Manager group can access this view.
@@ -111,6 +212,7 @@ class ManagerList(generics.ListCreateAPIView):
 
     """
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    schema = ApiAutoSchema(operation_id_base='Manager', component_name='GroupMember')
     queryset = User.objects.filter(groups__name='Manager')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsManager]
@@ -133,7 +235,7 @@ class ManagerList(generics.ListCreateAPIView):
         user.groups.add(group)
         return JsonResponse({'message': 'User added to Manager group'}, status=201)
 
-class ManagerRemove(generics.DestroyAPIView):
+class ManagerRemove(ProfiledViewMixin, generics.DestroyAPIView):
     """
     Remove a user from the Manager group.
     Only authenticated users with the Manager group can access this view.
@@ -142,6 +244,7 @@ class ManagerRemove(generics.DestroyAPIView):
     
     """
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    schema = ApiAutoSchema(operation_id_base='Manager', component_name='GroupMember')
     queryset = User.objects.filter(groups__name='Manager')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsManager]
@@ -159,7 +262,7 @@ class ManagerRemove(generics.DestroyAPIView):
         user.groups.remove(group)
         return JsonResponse({'message': 'User removed from Manager group'}, status=200)
      
-class DeliveryCrewList(generics.ListCreateAPIView):
+class DeliveryCrewList(ProfiledViewMixin, generics.ListCreateAPIView):
     """
     List all users in the Delivery Crew group or add a new user to the Delivery Crew group.
     Only authenticated users with the Manager group can access this view.
@@ -168,6 +271,7 @@ class DeliveryCrewList(generics.ListCreateAPIView):
     
     """
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    schema = ApiAutoSchema(operation_id_base='DeliveryCrew', component_name='GroupMember')
     queryset = User.objects.filter(groups__name='Delivery Crew')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsManager]
@@ -194,7 +298,7 @@ class DeliveryCrewList(generics.ListCreateAPIView):
         user.groups.add(group)
         return JsonResponse({'message': 'User added to Delivery Crew group'}, status=201)
     
-class DeliveryCrewRemove(generics.DestroyAPIView):
+class DeliveryCrewRemove(ProfiledViewMixin, generics.DestroyAPIView):
     """
     Remove a user from the Delivery Crew group.
     Only authenticated users with the Manager group can access this view.
@@ -203,6 +307,7 @@ class DeliveryCrewRemove(generics.DestroyAPIView):
         
     """
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    schema = ApiAutoSchema(operation_id_base='DeliveryCrew', component_name='GroupMember')
     queryset = User.objects.filter(groups__name='Delivery Crew')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsManager]
@@ -220,10 +325,99 @@ class DeliveryCrewRemove(generics.DestroyAPIView):
         user.groups.remove(group)
         return JsonResponse({'message': 'User removed from Delivery crew group'}, status=200)
 
-class CartList(generics.ListCreateAPIView):
+class GroupMembershipBatch(ProfiledViewMixin, generics.GenericAPIView):
+    """
+    Add (POST) or remove (DELETE) many users to or from a group at once.
+    The body lists the users by id or username: {"users": [12, "jane", ...]}.
+    Users, the group and existing memberships are resolved in a constant
+    number of queries and memberships are written in bulk.
+    Only authenticated users with the Manager group can access this view.
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    permission_classes = [IsAuthenticated, IsManager]
+    group_name = None
+    membership = User.groups.through
+
+    def resolve(self, request):
+        """ Return (group, {user id: username}, not found entries) or an error response """
+        users = request.data.get('users')
+        if not isinstance(users, list) or not users:
+            return JsonResponse({'error': 'A list of user ids or usernames is required'}, status=400)
+        if len(users) > settings.GROUP_BATCH_MAX_USERS:
+            return JsonResponse({'error': f'At most {settings.GROUP_BATCH_MAX_USERS} users per request'}, status=400)
+
+        # JSON true and false would pass as the ids 1 and 0
+        invalid = [user for user in users if isinstance(user, bool) or not isinstance(user, (int, str))]
+        if invalid:
+            return JsonResponse({'error': 'Users must be ids or usernames', 'invalid': invalid}, status=400)
+
+        ids = {user for user in users if isinstance(user, int)}
+        usernames = {user for user in users if isinstance(user, str)}
+        found = dict(User.objects.filter(Q(id__in=ids) | Q(username__in=usernames)).values_list('id', 'username'))
+        found_usernames = set(found.values())
+        not_found = [user for user in users if user not in found and user not in found_usernames]
+
+        try:
+            group = Group.objects.get(name=self.group_name)
+        except Group.DoesNotExist:
+            return JsonResponse({'error': f'{self.group_name} group does not exist'}, status=404)
+        return group, found, not_found
+
+    def post(self, request, *args, **kwargs):
+        resolved = self.resolve(request)
+        if isinstance(resolved, JsonResponse):
+            return resolved
+        group, found, not_found = resolved
+
+        members = set(self.membership.objects.filter(group=group, user_id__in=found)
+                      .values_list('user_id', flat=True))
+        new = [user_id for user_id in found if user_id not in members]
+        self.membership.objects.bulk_create(
+            [self.membership(user_id=user_id, group_id=group.id) for user_id in new],
+            ignore_conflicts=True,
+        )
+        return JsonResponse({
+            'added': [found[user_id] for user_id in new],
+            'already_members': [found[user_id] for user_id in members],
+            'not_found': not_found,
+        }, status=200)
+
+    def delete(self, request, *args, **kwargs):
+        resolved = self.resolve(request)
+        if isinstance(resolved, JsonResponse):
+            return resolved
+        group, found, not_found = resolved
+
+        memberships = self.membership.objects.filter(group=group, user_id__in=found)
+        members = set(memberships.values_list('user_id', flat=True))
+        memberships.delete()
+        return JsonResponse({
+            'removed': [found[user_id] for user_id in members],
+            'not_members': [found[user_id] for user_id in found if user_id not in members],
+            'not_found': not_found,
+        }, status=200)
+
+
+class ManagerBatch(GroupMembershipBatch):
+    group_name = 'Manager'
+    schema = ApiAutoSchema(operation_id_base='ManagerBatch')
+
+
+class DeliveryCrewBatch(GroupMembershipBatch):
+    group_name = 'Delivery Crew'
+    schema = ApiAutoSchema(operation_id_base='DeliveryCrewBatch')
+
+
+class CartList(ProfiledViewMixin, generics.ListCreateAPIView):
     """
     List all items in the cart or add a new item to the cart.
     Only authenticated users can access this view.
+    The list includes the summary of the whole cart, see CartSummary.
+    Adds sent with an Idempotency-Key header are applied once,
+    retries get the first response back.
     The API is rate-limited to 10 requests per minute for authenticated users
     and 5 requests per minute for anonymous users.
 
@@ -231,13 +425,21 @@ class CartList(generics.ListCreateAPIView):
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
-    search_fields = ['menuitem__title']
+    # Menu items live in 'default', not in the cart's shard
+    remote_search_fields = [('menuitem', 'title')]
+    remote_ordering_fields = {'menuitem__title': 'menuitem'}
     ordering_fields = ['menuitem__title', 'quantity']
     pagination_class = CartListPagination
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).order_by('id')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['summary'] = cart_summary(request.user)
+        return response
     
+    @idempotent
     def post(self, request, *args, **kwargs):
         menuitem_id = request.data.get('menuitem_id')
         quantity = request.data.get('quantity')
@@ -258,13 +460,35 @@ class CartList(generics.ListCreateAPIView):
         )
 
         if not created:
-            cart_item.quantity += quantity
-            cart_item.price = cart_item.unit_price * cart_item.quantity
-            cart_item.save()
+            # Add in the database, so that concurrent adds to the same line are not lost
+            Cart.objects.filter(pk=cart_item.pk).update(
+                quantity=F('quantity') + quantity,
+                price=F('unit_price') * (F('quantity') + quantity),
+                touched_at=timezone.now(),
+            )
+            invalidate_summaries([request.user.pk], cart_item._state.db)
+            cart_item.refresh_from_db(fields=['quantity'])
 
         return Response({'message': f"Cart updated successfully, {cart_item.quantity}"}, status=201)
+
+
+class CartSummary(ProfiledViewMixin, generics.GenericAPIView):
+    """
+    Return the number of lines, the number of items and the total of the cart,
+    computed in one query and cached until the cart changes.
+    Only authenticated users can access this view.
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartSummarySerializer
+
+    def get(self, request, *args, **kwargs):
+        return Response(cart_summary(request.user))
     
-class SingleCartItem(generics.RetrieveUpdateDestroyAPIView):
+class SingleCartItem(ProfiledViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a cart item.
     Only authenticated users can access this view.
@@ -281,13 +505,27 @@ class SingleCartItem(generics.RetrieveUpdateDestroyAPIView):
     
     def put(self, request, *args, **kwargs):
         return super().put(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_summaries([instance.user_id], instance._state.db)
     
-class OrderList(generics.ListCreateAPIView):
+class OrderList(ProfiledViewMixin, generics.ListCreateAPIView):
     """
     List all orders or create a new order.
     Only authenticated users can create new orders.
-    The list is paginated and can be filtered by user and status.
-    The results can be ordered by user and status.
+    Checkouts sent with an Idempotency-Key header are placed once,
+    retries get the first response back.
+    The list is paginated and can be filtered by user, delivery crew and status,
+    by date range with ?date__gte= and ?date__lte= and by total with
+    ?total__gte= and ?total__lte=, see LittleLemonAPI/filters.py.
+    ?search= matches the username.
+    The results can be ordered by user, status, date and total.
+    Orders are kept per restaurant location (X-Location header or ?location=),
+    ?location=all lists the orders of every location.
+    Responses can be limited to ?fields=id,status,total and the order
+    items rendered with their menu items with ?expand=orderitem.
+    Archived orders are listed with ?archived=true.
     The API is rate-limited to 10 requests per minute for authenticated users
     and 5 requests per minute for anonymous users.
 
@@ -295,22 +533,36 @@ class OrderList(generics.ListCreateAPIView):
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
-    search_fields = ['user__username', 'status']
-    ordering_fields = ['user__username', 'status']
-    search_fields = ['user__username', 'status']
-    ordering_fields = ['user__username', 'status']
-    filterset_fields = ['user', 'status']
+    # Users live in 'default', not in the order's shard: ?search= resolves the
+    # usernames there and ?ordering=user sorts by user id
+    remote_search_fields = [('user', 'username')]
+    ordering_fields = ['user', 'status', 'date', 'total']
     ordering = ['-date']
     pagination_class = OrderListPagination
 
+    @property
+    def filterset_class(self):
+        return ArchivedOrderFilter if reads_archive(self.request) else OrderFilter
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if current_location() == ALL:
+            # ?location=all lists the orders of every location, merged in the requested order
+            return ShardedQuerySet(queryset)
+        return queryset
+
     def get_queryset(self, *args, **kwargs):
+        model = ArchivedOrder if reads_archive(self.request) else Order
         if self.request.user.groups.filter(name='Manager').exists() or self.request.user.is_superuser:
-            query = Order.objects.all()
+            query = model.objects.all()
         elif self.request.user.groups.filter(name='Delivery Crew').exists():
-            query = Order.objects.filter(delivery_crew=self.request.user)
+            query = model.objects.filter(delivery_crew=self.request.user)
         else:
-            query = Order.objects.filter(user=self.request.user)
-        return query
+            query = model.objects.filter(user=self.request.user)
+        return with_order_relations(self.request, query)
+
+    def get_serializer_class(self):
+        return ArchivedOrderSerializer if reads_archive(self.request) else OrderSerializer
     
     def get_permissions(self):
         if self.request.method == 'POST' or self.request.method == 'GET':
@@ -320,42 +572,44 @@ class OrderList(generics.ListCreateAPIView):
 
         return [permission() for permission in permission_classes]
     
+    @idempotent
     def post(self, request, *args, **kwargs):
         cart_items = Cart.objects.filter(user=request.user)
 
         if not cart_items.exists():
             return Response({'error': 'Cart is empty'}, status=400)
 
-        order = Order.objects.create(user=request.user, total=Decimal('0.00'))
+        with transaction.atomic(using=current_shard()):
+            lines = [(item.menuitem, item.quantity, item.menuitem.price * item.quantity) for item in cart_items]
+            total = sum((price for _, _, price in lines), Decimal('0.00'))
 
-        order_items = []
-        total = Decimal('0.00')
+            # Saved once, with its total, so the change log records the checkout as one created row
+            order = Order.objects.create(user=request.user, total=total)
+            order_items = [
+                OrderItem(order=order, menuitem=menuitem, quantity=quantity, price=price)
+                for menuitem, quantity, price in lines
+            ]
+            OrderItem.objects.bulk_create(order_items)
 
-        for item in cart_items:
-            item_total = item.menuitem.price * item.quantity
-            order_items.append(OrderItem(
-                order=order,
-                menuitem=item.menuitem,
-                quantity=item.quantity,
-                price=item_total
-            ))
-            total += item_total
+            cart_items.delete()
+            invalidate_summaries([request.user.pk], current_shard())
 
-        OrderItem.objects.bulk_create(order_items)
+            items = [(item.menuitem_id, item.quantity, item.price) for item in order_items]
+            publish(Order, current_shard(), [
+                (order.id, ORDER_CREATED, order_created(order.id, order.user_id, total, order.status, order.date, items)),
+            ])
 
-        order.total = total
-        order.save()
-
-        cart_items.delete()
+            # Follow-up work runs in the job worker, not in the checkout request
+            enqueue('order_placed', using=current_shard(), order_id=order.id, location=current_location())
 
         return Response({'message': 'Order created successfully', 'order_id': order.id}, status=201)
     
-class SingleOrder(generics.RetrieveUpdateDestroyAPIView):
+class SingleOrder(ProfiledViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an order.
     Only authenticated users can retrieve their own orders.
     Only managers can update or delete orders.
-    The order can be retrieved by its ID.
+    The order can be retrieved by its ID, archived orders with ?archived=true.
     The API is rate-limited to 10 requests per minute for authenticated users
     and 5 requests per minute for anonymous users.
 
@@ -365,10 +619,15 @@ class SingleOrder(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        model = ArchivedOrder if reads_archive(self.request) else Order
         if self.request.user.groups.filter(name='Manager').exists() or self.request.user.is_superuser:
-            return Order.objects.all()
+            query = model.objects.all()
         else:
-            return Order.objects.filter(user=self.request.user)
+            query = model.objects.filter(user=self.request.user)
+        return with_order_relations(self.request, query)
+
+    def get_serializer_class(self):
+        return ArchivedOrderSerializer if reads_archive(self.request) else OrderSerializer
 
     def get_permissions(self):
         if self.request.method == 'POST' or self.request.method == 'GET':
@@ -388,8 +647,20 @@ class SingleOrder(generics.RetrieveUpdateDestroyAPIView):
         
         serializer = self.get_serializer(order, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data, status=200)
+
+    def perform_update(self, serializer):
+        order = serializer.instance
+        before = {field.attname: getattr(order, field.attname) for field in Order._meta.concrete_fields}
+        with transaction.atomic(using=order._state.db):
+            serializer.save()
+            changes = {
+                attname: getattr(order, attname)
+                for attname, value in before.items() if getattr(order, attname) != value
+            }
+            if changes:
+                publish(Order, order._state.db, [(order.id, ORDER_UPDATED, order_updated(order.id, changes))])
     
     def delete(self, request, *args, **kwargs):
         order = self.get_object()
@@ -399,4 +670,236 @@ class SingleOrder(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'You do not have permission to delete this order'}, status=403)
 
         order.delete()
-        return Response(status=204)
\ No newline at end of file
+        return Response(status=204)
+
+class ReorderOrder(ProfiledViewMixin, generics.GenericAPIView):
+    """
+    Copy the items of one of your orders, live or archived, to your cart
+    at the current menu prices, adding to the quantities already in the cart.
+    Items that are no longer on the menu are skipped.
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    permission_classes = [IsAuthenticated]
+
+    @idempotent
+    def post(self, request, pk, *args, **kwargs):
+        if Order.objects.filter(pk=pk, user=request.user).exists():
+            item_model = OrderItem
+        elif ArchivedOrder.objects.filter(pk=pk, user=request.user).exists():
+            item_model = ArchivedOrderItem
+        else:
+            return Response({'error': 'Order does not exist'}, status=404)
+
+        shard = current_shard()
+        with transaction.atomic(using=shard):
+            lines = list(item_model.objects.filter(order_id=pk).values_list('menuitem_id', 'quantity'))
+            # Menu items deleted since the order are skipped, as the copy below does
+            menu = MenuItem.objects.in_bulk([menuitem_id for menuitem_id, _ in lines])
+            copied = [(menu[menuitem_id], quantity) for menuitem_id, quantity in lines if menuitem_id in menu]
+            if copied:
+                copy_order_to_cart(request.user, pk, item_model, using=shard)
+
+        return Response({
+            'message': f"{len(copied)} items added to cart",
+            'copied': [
+                {'menuitem': menuitem.id, 'title': menuitem.title,
+                 'quantity': quantity, 'unit_price': menuitem.price}
+                for menuitem, quantity in copied
+            ],
+            'skipped': len(lines) - len(copied),
+        }, status=201 if copied else 200)
+
+
+class ChangeFeed(ProfiledViewMixin, generics.GenericAPIView):
+    """
+    Return the categories, menu items and orders changed after a sync token.
+    Call without parameters to get the current token, then pass the token
+    from the last response as ?since=<token> to receive only the rows
+    created, updated, deleted or archived after it. Changes are handed out
+    CHANGES_FEED_SETTLE_SECONDS after they were made.
+    Orders are limited to the ones placed by the current user at the
+    requested location (X-Location header or ?location=), tokens are
+    per location.
+    A token older than CHANGES_FEED_RETENTION_DAYS gets a 410, the client
+    has to sync from scratch with a new token.
+    At most CHANGES_FEED_LIMIT changes are returned per call,
+    has_more tells the client to call again with the new token.
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    permission_classes = [IsAuthenticated]
+    feeds = {
+        'category': ('categories', Category.objects.all(), CategorySerializer),
+        'menuitem': ('menuitems', MenuItem.objects.all(), MenuItemSerializer),
+        'order': ('orders', Order.objects.prefetch_related('order'), OrderSerializer),
+    }
+
+    def logs(self, request):
+        """
+            The two logs a token points into, as (database, rows): catalog changes in
+            'default' or one of its replicas, and the user's order changes at the location,
+            in the location's shard. The database is picked once, so the horizon, the rows
+            and the changed objects of a call are all read from the same copy.
+        """
+        catalog = router.db_for_read(ChangeLog)
+        return [
+            (catalog, ChangeLog.objects.using(catalog).filter(user__isnull=True)),
+            (current_shard(), ChangeLog.objects.using(current_shard())
+             .filter(user=request.user, location=current_location())),
+        ]
+
+    def get(self, request, *args, **kwargs):
+        if current_location() == ALL:
+            return Response({'error': 'The changes feed reads one location at a time'}, status=400)
+
+        logs = self.logs(request)
+        # Rows up to the newest one older than the settle time are handed out, a younger
+        # row may still be joined by a lower id from a transaction that has not committed
+        cutoff = timezone.now() - timedelta(seconds=settings.CHANGES_FEED_SETTLE_SECONDS)
+        horizons = [
+            ChangeLog.objects.using(using).filter(created_at__lte=cutoff)
+            .order_by('-id').values_list('id', flat=True).first() or 0
+            for using, _ in logs
+        ]
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'token': '.'.join(map(str, horizons))})
+
+        # '<catalog id>.<order id>', a single id from before orders were sharded stands for both
+        try:
+            positions = [int(part) for part in since.split('.')]
+        except ValueError:
+            positions = []
+        if len(positions) == 1:
+            positions *= 2
+        if len(positions) != 2:
+            return Response({'error': 'since must be a token returned by this endpoint'}, status=400)
+
+        for i, (using, _) in enumerate(logs):
+            oldest = ChangeLog.objects.using(using).order_by('id').values_list('id', flat=True).first()
+            if oldest is not None and positions[i] < oldest - 1:
+                # Rows after the token were pruned
+                return Response({'error': 'since is older than the change log, sync from scratch'}, status=410)
+
+        remaining = settings.CHANGES_FEED_LIMIT
+        entries, has_more = [], False
+        for i, (_, log) in enumerate(logs):
+            rows = list(log.filter(id__gt=positions[i], id__lte=horizons[i]).order_by('id')
+                        .values_list('id', 'model', 'object_id', 'action')[:remaining + 1])
+            if len(rows) > remaining:
+                has_more = True
+                rows = rows[:remaining]
+                if rows:
+                    positions[i] = rows[-1][0]
+            else:
+                # Caught up, skip the rows of other users and locations too
+                positions[i] = max(positions[i], horizons[i])
+            entries += rows
+            remaining -= len(rows)
+
+        # Only the last change of each row matters to the client
+        latest_action = {}
+        for _, model, object_id, action in entries:
+            latest_action[(model, object_id)] = action
+
+        data = {'token': '.'.join(map(str, positions)), 'has_more': has_more}
+        for model, (key, queryset, serializer_class) in self.feeds.items():
+            ids = [object_id for (m, object_id), action in latest_action.items()
+                   if m == model and action not in (ChangeLog.DELETED, ChangeLog.ARCHIVED)]
+            deleted = [object_id for (m, object_id), action in latest_action.items()
+                       if m == model and action == ChangeLog.DELETED]
+            if model == 'order':
+                queryset = queryset.using(logs[1][0]).filter(user=request.user)
+            else:
+                queryset = queryset.using(logs[0][0])
+            rows = queryset.in_bulk(ids) if ids else {}
+            # Rows deleted after the logged change show up as deletions
+            deleted += [object_id for object_id in ids if object_id not in rows]
+            data[key] = {
+                'changed': serializer_class(rows.values(), many=True, context={'request': request}).data,
+                'deleted': deleted,
+            }
+            if model == 'order':
+                # Moved to the archive tables, listed with ?archived=true
+                data[key]['archived'] = [object_id for (m, object_id), action in latest_action.items()
+                                         if m == model and action == ChangeLog.ARCHIVED]
+        return Response(data)
+
+
+class ProfileCaptureList(generics.ListAPIView):
+    """
+    List the stored request profiles, newest first.
+    Requests are profiled when a staff user sends the X-Profile header
+    or when sampled with PROFILE_SAMPLE_RATE.
+    Only admin users can access this view.
+
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+    """
+    queryset = ProfileCapture.objects.defer('cpu_profile', 'cpu_summary', 'allocations').order_by('-id')
+    serializer_class = ProfileCaptureSerializer
+    permission_classes = [IsAdminUser]
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+
+
+class SingleProfileCapture(generics.RetrieveAPIView):
+    """
+    Retrieve a request profile with its CPU and allocation summaries.
+    Add ?download=1 to get the raw profile, readable with pstats.Stats or snakeviz.
+    Only admin users can access this view.
+
+    The API is rate-limited to 10 requests per minute for authenticated users
+    and 5 requests per minute for anonymous users.
+    """
+    queryset = ProfileCapture.objects.all()
+    serializer_class = ProfileCaptureSerializer
+    permission_classes = [IsAdminUser]
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+
+    def retrieve(self, request, *args, **kwargs):
+        capture = self.get_object()
+        if request.query_params.get('download'):
+            response = HttpResponse(bytes(capture.cpu_profile), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="profile-{capture.id}.prof"'
+            return response
+        return Response(self.get_serializer(capture, context={'request': request, 'detail': True}).data)
+
+
+class AdmissionStats(generics.GenericAPIView):
+    """
+    Return the admission control counters of the worker process that serves the request:
+    requests in flight, the average queueing delay and, per priority class,
+    the requests admitted, shed and timed out since the worker started.
+    Only admin users can access this view.
+
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'pid': os.getpid(), **controller().snapshot()})
+
+
+def openapi_schema(request):
+    """
+    Serve the OpenAPI schema of the API, built once per process or by the
+    generate_schema command, gzip-compressed when the client accepts it.
+    Clients revalidate with the ETag and get 304 while the schema is unchanged.
+    The schema is public.
+    """
+    schema = document()
+    if request.headers.get('If-None-Match') == schema.etag:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(schema.gzip, content_type='application/vnd.oai.openapi+json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(schema.content, content_type='application/vnd.oai.openapi+json')
+    response['ETag'] = schema.etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=settings.SCHEMA_CACHE_SECONDS)
+    return response
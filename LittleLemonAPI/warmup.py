@@ -0,0 +1,80 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import get_resolver, URLResolver
+
+from .schema import document
+
+"""
+    Worker warm-up, run by wsgi.py and asgi.py when WARM_UP_ON_START is set, so servers
+    warm up once they load the application and management commands never do.
+
+    Django compiles URL patterns, DRF builds serializer fields, the OpenAPI schema is
+    loaded and cache backends connect lazily, on the first request that needs them.
+    Doing it at startup moves that cost out of the first requests a worker serves.
+    The database is not touched.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def view_classes(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from view_classes(pattern.url_patterns)
+        else:
+            view_class = getattr(pattern.callback, 'cls', None) or getattr(pattern.callback, 'view_class', None)
+            if view_class is not None:
+                yield view_class
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Imports every urls and views module and compiles the reverse lookup tables
+    resolver._populate()
+    return list(view_classes(resolver.url_patterns))
+
+
+def warm_serializers(classes):
+    built = set()
+    for view_class in classes:
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is None or serializer_class in built:
+            continue
+        # Builds the fields once, filling the model _meta caches they rely on
+        serializer_class().fields
+        built.add(serializer_class)
+    return built
+
+
+def warm_schema():
+    # Reads SCHEMA_FILE, or generates the schema when the file is missing
+    document()
+
+
+def warm_caches():
+    for alias in settings.CACHES:
+        caches[alias].get('warmup')
+
+
+def warm_up_on_start():
+    if settings.WARM_UP_ON_START:
+        warm_up()
+
+
+def warm_up():
+    started = time.perf_counter()
+    classes = warm_urls()
+    urls_done = time.perf_counter()
+    serializers = warm_serializers(classes)
+    serializers_done = time.perf_counter()
+    warm_schema()
+    schema_done = time.perf_counter()
+    warm_caches()
+    logger.info(
+        "Warmed up %d views in %.3fs, %d serializers in %.3fs, the schema in %.3fs, caches in %.3fs",
+        len(classes), urls_done - started, len(serializers), serializers_done - urls_done,
+        schema_done - serializers_done, time.perf_counter() - schema_done,
+    )
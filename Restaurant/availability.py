@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from .models import Booking, BookedDay
+
+"""
+    Slot availability for bookings.
+
+    Each slot has BOOKING_TABLES tables. A booking claims the first free table of its slot,
+    the unique (date, slot, table) constraint guarantees a table is never claimed twice.
+    A booking that loses a table to a concurrent one retries once with the next free table.
+    BookedDay keeps a bitmap of the full slots of each day, so availability over a range of
+    days reads one small row per busy day instead of scanning bookings.
+"""
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def full_slots_bitmap(date):
+    bitmap = 0
+    counts = (Booking.objects.filter(reservation_date=date)
+              .values('reservation_slot').annotate(booked=Count('id')))
+    for row in counts:
+        if row['booked'] >= settings.BOOKING_TABLES:
+            bitmap |= 1 << row['reservation_slot']
+    return bitmap
+
+
+def refresh_day(date):
+    """ Recompute the availability index of a day from its bookings """
+    BookedDay.objects.update_or_create(date=date, defaults={'full_slots': full_slots_bitmap(date)})
+
+
+def rebuild(dates=None):
+    """ Recompute the index for the given days, or every booked day, e.g. after BOOKING_TABLES changed """
+    if dates is None:
+        BookedDay.objects.all().delete()
+        dates = Booking.objects.values_list('reservation_date', flat=True).distinct()
+    for date in dates:
+        refresh_day(date)
+
+
+def taken_tables(reservation_date, reservation_slot):
+    return set(Booking.objects.filter(reservation_date=reservation_date, reservation_slot=reservation_slot)
+               .values_list('table', flat=True))
+
+
+def claim_slot(first_name, reservation_date, reservation_slot):
+    """ Book the first free table of a slot, raises SlotUnavailable when the slot is full """
+    if reservation_slot not in settings.BOOKING_SLOTS:
+        raise SlotUnavailable(f"{reservation_slot} is not a bookable slot")
+
+    for attempt in (1, 2):
+        table = None
+        try:
+            with transaction.atomic():
+                # Lock the day so concurrent bookings of it are serialized,
+                # the unique constraint still rejects a double claim if they are not
+                BookedDay.objects.select_for_update().get_or_create(date=reservation_date)
+                taken = taken_tables(reservation_date, reservation_slot)
+                free = [number for number in range(1, settings.BOOKING_TABLES + 1) if number not in taken]
+                if not free:
+                    raise SlotUnavailable(f"Slot {reservation_slot} on {reservation_date} is fully booked")
+                table = free[0]
+                return Booking.objects.create(
+                    first_name=first_name,
+                    reservation_date=reservation_date,
+                    reservation_slot=reservation_slot,
+                    table=table,
+                )
+        except IntegrityError:
+            # Only a table claimed in the meantime is a conflict, any other error is a bug
+            if table is None or not Booking.objects.filter(
+                    reservation_date=reservation_date, reservation_slot=reservation_slot, table=table).exists():
+                raise
+            if attempt == 2:
+                raise SlotUnavailable(f"Slot {reservation_slot} on {reservation_date} is busy, try again")
+
+
+def free_slots(start, days):
+    """ The free slots of each day from start, as a list of (date, [slots]) """
+    end = start + timedelta(days=days - 1)
+    full = dict(BookedDay.objects.filter(date__range=(start, end), full_slots__gt=0)
+                .values_list('date', 'full_slots'))
+    calendar = []
+    for offset in range(days):
+        date = start + timedelta(days=offset)
+        bitmap = full.get(date, 0)
+        calendar.append((date, [slot for slot in settings.BOOKING_SLOTS if not bitmap & (1 << slot)]))
+    return calendar
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+"""
+    Full-page caching for the public website.
+
+    Pages are rendered once, stored with a gzip-compressed copy and an ETag,
+    and served from the cache until they expire. Menu pages are keyed on the menu
+    version, which is bumped whenever a Menu row changes, so an edit is visible
+    on the next request without clearing anything. The version lives in the
+    default cache, which has to be shared by every worker (see CACHES).
+
+    Only anonymous requests without cookies share cached pages, and a page is only
+    stored if rendering it used no session or CSRF token, so nothing of one visitor
+    ends up in another's page. Other requests render the page from cached data.
+"""
+
+MENU_VERSION_KEY = 'restaurant:menu-version'
+
+
+def menu_version():
+    # Start from the clock rather than 1, so an evicted version never returns to
+    # a number whose pages may still be cached
+    cache.add(MENU_VERSION_KEY, time.time_ns(), None)
+    return cache.get(MENU_VERSION_KEY) or time.time_ns()
+
+
+def bump_menu_version():
+    def bump():
+        try:
+            cache.incr(MENU_VERSION_KEY)
+        except ValueError:
+            cache.set(MENU_VERSION_KEY, time.time_ns(), None)
+
+    # After the commit, or another worker could cache the old rows under the new version
+    transaction.on_commit(bump)
+
+
+def shares_pages(request):
+    """ Whether a request can be answered with, and rendered into, a page shared by every visitor """
+    return request.method in ('GET', 'HEAD') and not request.COOKIES
+
+
+def is_personal(request, response):
+    """ Whether rendering the page read the session or issued a CSRF token """
+    session = getattr(request, 'session', None)
+    return bool(response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+                or (session is not None and session.accessed))
+
+
+def cached_page(request, key, render_page):
+    """ Serve the page cached under key, calling render_page() to build it on a miss """
+    if not shares_pages(request):
+        return render_page()
+
+    entry = cache.get(key)
+    if entry is None:
+        response = render_page()
+        if response.status_code != 200 or is_personal(request, response):
+            return response
+        content = response.content
+        entry = {
+            'content': content,
+            'gzip': gzip.compress(content),
+            'content_type': response['Content-Type'],
+            'etag': '"%s"' % hashlib.md5(content).hexdigest(),
+        }
+        cache.set(key, entry, settings.PAGE_CACHE_SECONDS)
+
+    if request.headers.get('If-None-Match') == entry['etag']:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(entry['gzip'], content_type=entry['content_type'])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    patch_vary_headers(response, ['Accept-Encoding', 'Cookie'])
+    return response
@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from Restaurant.models import Booking
+from Restaurant.availability import free_slots, rebuild
+
+
+class Command(BaseCommand):
+    help = ("Time 30-day availability queries over a year of bookings, from the availability "
+            "index and by scanning bookings. The generated bookings are rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help="Days of bookings to generate.")
+        parser.add_argument('--fill', type=float, default=0.7, help="Fraction of tables booked.")
+        parser.add_argument('--repeat', type=int, default=200, help="Queries timed per method.")
+
+    def scan_free_slots(self, start, days):
+        """ Availability without the index, for comparison """
+        end = start + timedelta(days=days - 1)
+        booked = {}
+        counts = (Booking.objects.filter(reservation_date__range=(start, end))
+                  .values('reservation_date', 'reservation_slot').annotate(booked=Count('id')))
+        for row in counts:
+            booked[(row['reservation_date'], row['reservation_slot'])] = row['booked']
+        calendar = []
+        for offset in range(days):
+            date = start + timedelta(days=offset)
+            calendar.append((date, [slot for slot in settings.BOOKING_SLOTS
+                                    if booked.get((date, slot), 0) < settings.BOOKING_TABLES]))
+        return calendar
+
+    def time(self, label, query, starts):
+        began = time.perf_counter()
+        for start in starts:
+            query(start, settings.BOOKING_CALENDAR_DAYS)
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f"{label}: {elapsed / len(starts) * 1000:.3f} ms per query")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            bookings = [
+                Booking(first_name='benchmark', reservation_date=today + timedelta(days=day),
+                        reservation_slot=slot, table=table)
+                for day in range(options['days'])
+                for slot in settings.BOOKING_SLOTS
+                for table in range(1, settings.BOOKING_TABLES + 1)
+                if rng.random() < options['fill'] or slot in (19, 20)
+            ]
+            Booking.objects.bulk_create(bookings, batch_size=1000, ignore_conflicts=True)
+            rebuild(today + timedelta(days=day) for day in range(options['days']))
+            self.stdout.write(f"Generated {len(bookings)} bookings over {options['days']} days")
+
+            starts = [today + timedelta(days=rng.randrange(options['days'])) for _ in range(options['repeat'])]
+            assert free_slots(starts[0], 30) == self.scan_free_slots(starts[0], 30)
+            self.time("Availability index", free_slots, starts)
+            self.time("Booking scan", self.scan_free_slots, starts)
+
+            transaction.set_rollback(True)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+# The Booking and Menu tables exactly as the app defined them before it shipped
+# migrations. A database that applied a locally generated Restaurant 0001_initial
+# already records this migration and needs nothing. One whose tables exist without
+# that record (created by hand or by a differently named local migration, which
+# has to be removed from django_migrations) is brought under these migrations with
+#   python manage.py migrate Restaurant --fake-initial
+# which marks this migration applied because its tables exist, then runs 0002.
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=200)),
+                ('reservation_date', models.DateField()),
+                ('reservation_slot', models.SmallIntegerField(default=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Menu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.IntegerField()),
+                ('menu_item_description', models.TextField(default='', max_length=1000)),
+            ],
+        ),
+    ]
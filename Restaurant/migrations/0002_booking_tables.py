@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_tables(apps, schema_editor):
+    """ Give existing bookings of the same slot distinct tables before the unique constraint is added """
+    Booking = apps.get_model('Restaurant', 'Booking')
+    BookedDay = apps.get_model('Restaurant', 'BookedDay')
+    counts = {}
+    for booking in Booking.objects.order_by('reservation_date', 'reservation_slot', 'id'):
+        key = (booking.reservation_date, booking.reservation_slot)
+        counts[key] = counts.get(key, 0) + 1
+        if booking.table != counts[key]:
+            booking.table = counts[key]
+            booking.save(update_fields=['table'])
+
+    days = {}
+    for (date, slot), booked in counts.items():
+        days.setdefault(date, 0)
+        if booked >= settings.BOOKING_TABLES:
+            days[date] |= 1 << slot
+    BookedDay.objects.bulk_create([BookedDay(date=date, full_slots=bitmap) for date, bitmap in days.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Restaurant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('full_slots', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='table',
+            field=models.SmallIntegerField(default=1),
+        ),
+        migrations.RunPython(number_tables, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('reservation_date', 'reservation_slot', 'table'), name='unique_booking_table'),
+        ),
+    ]
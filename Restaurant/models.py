@@ -5,11 +5,31 @@ class Booking(models.Model):
     first_name = models.CharField(max_length=200)
     reservation_date = models.DateField()
     reservation_slot = models.SmallIntegerField(default=10)
+    table = models.SmallIntegerField(default=1)
+
+    class Meta:
+        # A table can only be claimed once per slot, this is what makes concurrent bookings safe
+        constraints = [
+            models.UniqueConstraint(fields=['reservation_date', 'reservation_slot', 'table'], name='unique_booking_table'),
+        ]
 
     def __str__(self): 
         return self.first_name
 
 
+class BookedDay(models.Model):
+    """
+    Availability index maintained on every booking change.
+    Bit n of full_slots is set when every table of slot n is booked,
+    days without a row have no full slot.
+    """
+    date = models.DateField(unique=True)
+    full_slots = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.date)
+
+
 # Add code to create Menu model
 class Menu(models.Model):
    name = models.CharField(max_length=200) 
@@ -17,4 +37,4 @@ class Menu(models.Model):
    menu_item_description = models.TextField(max_length=1000, default='') 
 
    def __str__(self):
-      return self.name
\ No newline at end of file
+      return self.name
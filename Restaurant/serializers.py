@@ -0,0 +1,18 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import Booking
+
+
+class BookingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Booking
+        fields = ['id', 'first_name', 'reservation_date', 'reservation_slot', 'table']
+        read_only_fields = ['table']
+        # The table is picked by claim_slot, which enforces the unique constraint itself
+        validators = []
+
+    def validate_reservation_slot(self, value):
+        if value not in settings.BOOKING_SLOTS:
+            raise serializers.ValidationError(f"Slot must be one of {settings.BOOKING_SLOTS}.")
+        return value
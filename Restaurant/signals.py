@@ -0,0 +1,33 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Booking, Menu
+from .availability import refresh_day
+from .caching import bump_menu_version
+
+
+@receiver(pre_save, sender=Booking)
+def remember_date(sender, instance, raw=False, **kwargs):
+    # A booking moved to another day frees its slot on the old day
+    if instance.pk and not raw:
+        instance._previous_date = (Booking.objects.filter(pk=instance.pk)
+                                   .values_list('reservation_date', flat=True).first())
+
+
+@receiver(post_save, sender=Booking)
+def refresh_on_save(sender, instance, raw=False, **kwargs):
+    refresh_day(instance.reservation_date)
+    previous = getattr(instance, '_previous_date', None)
+    if previous and previous != instance.reservation_date:
+        refresh_day(previous)
+
+
+@receiver(post_delete, sender=Booking)
+def refresh_on_delete(sender, instance, **kwargs):
+    refresh_day(instance.reservation_date)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalidate_menu_pages(sender, **kwargs):
+    bump_menu_version()
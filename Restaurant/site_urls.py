@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+# The public website, mounted at the root of the site. The bookings API is in urls.py
+urlpatterns = [
+    path('', views.home, name="home"),
+    path('about/', views.about, name="about"),
+    # path('book/', views.book, name="book"),
+    path('menu/', views.menu, name="menu"),
+    path('menu_item/<int:pk>/', views.display_menu_item, name="menu_item"),  
+]
@@ -1,3 +1,74 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .availability import claim_slot
+from .models import Booking, BookedDay
+
+DAY = date(2030, 5, 17)
+
+
+@override_settings(BOOKING_TABLES=2)
+class BookingCapacityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('joe'))
+
+    def book(self, slot=12, name='Joe'):
+        return self.client.post('/api/bookings/', {'first_name': name, 'reservation_date': DAY,
+                                                   'reservation_slot': slot}, format='json')
+
+    def free_slots(self):
+        response = self.client.get('/api/bookings/availability/', {'start': DAY.isoformat(), 'days': 1})
+        return response.data['days'][0]['free_slots']
+
+    def test_books_each_table_of_a_slot_once(self):
+        self.assertEqual(self.book().data['table'], 1)
+        self.assertEqual(self.book().data['table'], 2)
+
+        response = self.book()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertNotIn(12, self.free_slots())
+        self.assertIn(13, self.free_slots())
+
+    def test_cancelled_booking_frees_its_table(self):
+        self.book()
+        self.book()
+        Booking.objects.get(table=1).delete()
+
+        response = self.book()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['table'], 1)
+        self.assertEqual(BookedDay.objects.get(date=DAY).full_slots, 1 << 12)
+
+    def test_table_taken_concurrently_is_retried_with_the_next_one(self):
+        # Ann's booking of table 1 committed after Joe's request read the free tables
+        Booking.objects.create(first_name='Ann', reservation_date=DAY, reservation_slot=12, table=1)
+
+        with mock.patch('Restaurant.availability.taken_tables', side_effect=[set(), {1}]):
+            booking = claim_slot('Joe', DAY, 12)
+
+        self.assertEqual(booking.table, 2)
+
+    def test_table_lost_twice_is_a_conflict(self):
+        Booking.objects.create(first_name='Ann', reservation_date=DAY, reservation_slot=12, table=1)
+
+        with mock.patch('Restaurant.availability.taken_tables', return_value=set()):
+            response = self.book()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_other_integrity_errors_are_not_a_conflict(self):
+        with mock.patch.object(Booking.objects, 'create', side_effect=IntegrityError('NOT NULL constraint failed')), \
+                self.assertRaises(IntegrityError):
+            claim_slot('Joe', DAY, 12)
@@ -1,11 +1,9 @@
 from django.urls import path
 from . import views
 
+# The bookings API, mounted under api/. The website pages are in site_urls.py,
+# under api/ the menu page would be shadowed by the menu API
 urlpatterns = [
-    path('', views.home, name="home"),
-    path('about/', views.about, name="about"),
-    # path('book/', views.book, name="book"),
-    path('menu/', views.menu, name="menu"),
-    path('menu_item/<int:pk>/', views.display_menu_item, name="menu_item"),  
-    # path('bookings/', views.bookings, name="bookings"),
+    path('bookings/', views.BookingList.as_view(), name="bookings"),
+    path('bookings/availability/', views.BookingAvailability.as_view(), name="booking_availability"),
 ]
\ No newline at end of file
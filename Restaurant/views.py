@@ -1,18 +1,32 @@
 # from django.http import HttpResponse
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 
 from .models import Menu
 from django.core import serializers
 from .models import Booking
 from datetime import datetime
+from itertools import groupby
 import json
 # from .forms import BookingForm
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils import timezone
+from rest_framework import generics
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+
+from LittleLemonAPI.permissions import IsManager
+from .serializers import BookingSerializer
+from .availability import claim_slot, free_slots, SlotUnavailable
+from .caching import cached_page, menu_version
 
 def home(request):
-    return render(request, 'index.html')
+    return cached_page(request, 'restaurant:page:home', lambda: render(request, 'index.html'))
 
 def about(request):
-    return render(request, 'about.html')
+    return cached_page(request, 'restaurant:page:about', lambda: render(request, 'about.html'))
 
 # def book(request):
 #     form = BookingForm()
@@ -23,17 +37,90 @@ def about(request):
 #     context = {'form':form}
 #     return render(request, 'book.html', context)
 
-# Add code for the bookings() view
+class BookingList(generics.ListCreateAPIView):
+    """
+    List all bookings or book a table.
+    Anyone authenticated can book, a table is assigned from the free
+    tables of the requested slot. Only managers can list bookings.
+    The list can be filtered by reservation_date.
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    queryset = Booking.objects.order_by('reservation_date', 'reservation_slot', 'table')
+    serializer_class = BookingSerializer
+    filterset_fields = ['reservation_date']
+
+    def get_permissions(self):
+        if self.request.method == 'GET':
+            permission_classes = [IsAuthenticated, IsManager | IsAdminUser]
+        else:
+            permission_classes = [IsAuthenticated]
+        return [permission() for permission in permission_classes]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            booking = claim_slot(**serializer.validated_data)
+        except SlotUnavailable as error:
+            return Response({'error': str(error)}, status=409)
+        return Response(self.get_serializer(booking).data, status=201)
+
+
+class BookingAvailability(generics.GenericAPIView):
+    """
+    Free slots per day, for ?days= days (default and maximum BOOKING_CALENDAR_DAYS)
+    from ?start=YYYY-MM-DD (default today).
+    Answered from the per-day availability index, not from the bookings.
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() \
+                if 'start' in request.query_params else timezone.localdate()
+            days = int(request.query_params.get('days', settings.BOOKING_CALENDAR_DAYS))
+        except ValueError:
+            return Response({'error': 'start must be YYYY-MM-DD and days a number'}, status=400)
+        days = max(1, min(days, settings.BOOKING_CALENDAR_DAYS))
+
+        return Response({
+            'days': [{'date': date, 'free_slots': slots} for date, slots in free_slots(start, days)],
+        })
+
+
+def menu_page_rows(version, number):
+    """ The menu items of a page, cached per menu version """
+    def load():
+        bottom = (number - 1) * settings.MENU_PAGE_SIZE
+        return list(Menu.objects.order_by('name')[bottom:bottom + settings.MENU_PAGE_SIZE])
+    return cache.get_or_set(f'restaurant:menu-rows:{version}:{number}', load, settings.PAGE_CACHE_SECONDS)
+
 
 def menu(request):
-    menu_data = Menu.objects.all()
-    main_data = {"menu": menu_data}
-    return render(request, 'menu.html', {"menu": main_data})
+    version = menu_version()
+    count = cache.get_or_set(f'restaurant:menu-count:{version}', Menu.objects.count, None)
+    paginator = Paginator(range(count), settings.MENU_PAGE_SIZE)
+    # Resolve the page before building the key, so out of range pages share the last page's entry
+    page = paginator.get_page(request.GET.get('page'))
+
+    def render_page():
+        page.object_list = menu_page_rows(version, page.number)
+        # Items of the page grouped under the initial of their name, as the page is sorted
+        groups = [(initial, list(items)) for initial, items in
+                  groupby(page.object_list, key=lambda item: item.name[:1].upper())]
+        main_data = {"menu": page.object_list, "page": page, "groups": groups}
+        return render(request, 'menu.html', {"menu": main_data})
+
+    return cached_page(request, f'restaurant:menu:{version}:{page.number}', render_page)
 
 
 def display_menu_item(request, pk=None): 
-    if pk: 
-        menu_item = Menu.objects.get(pk=pk) 
-    else: 
-        menu_item = "" 
-    return render(request, 'menu_item.html', {"menu_item": menu_item}) 
\ No newline at end of file
+    version = menu_version()
+
+    def render_page():
+        menu_item = cache.get_or_set(f'restaurant:menu-item-row:{version}:{pk}',
+                                     lambda: get_object_or_404(Menu, pk=pk), settings.PAGE_CACHE_SECONDS) if pk else ""
+        return render(request, 'menu_item.html', {"menu_item": menu_item})
+
+    return cached_page(request, f'restaurant:menu-item:{version}:{pk}', render_page)